@@ -1,22 +1,32 @@
 import os
 import re
+import json
 import logging
 import random
+import time
 from datetime import datetime, timedelta
-import ipfshttpclient
-import requests
+
+# Heavy dependencies (sentence_transformers, faiss, pandas, groq, PyPDF2, ipfshttpclient) are
+# imported on first use, so importing this module stays fast and light
+_import_started = time.perf_counter()
+
 from flask import (
     Flask, request, session, redirect, url_for,
-    flash, render_template, jsonify
+    flash, render_template, jsonify, Response, stream_with_context
 )
 from functools import wraps
 import mysql.connector
 from mysql.connector import pooling, Error as MySQLError
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_cors import CORS
-from src.pipeline import RAGPipeline
+from src.catalogue import catalogue_path_for, is_catalogue_current, load_catalogue
+from src.http_client import HttpClient
+from src.ipfs_cache import PdfDiskCache, GatewayRacer
+from src.pdf_cache import PdfTextCache, document_key, chunk_text
+from src.pdf_extractor import extract_pdf
+from src.pdf_retriever import PdfChunkIndex, PromptSizeStats
+from src.process_info import memory_usage
 from flask import current_app
-import PyPDF2
 
 
 
@@ -108,15 +118,30 @@ else:
 # ============================================================
 # DB POOL / CONNECTION
 # ============================================================
+# Created on first use in each process: pooled sockets must never be shared by forked workers
 pool = None
-try:
-    if DB_CONFIG.get('password'):
-        pool = pooling.MySQLConnectionPool(**DB_CONFIG)
-        logger.info("✅ Database connection pool created successfully")
-    else:
+pool_pid = None
+
+def create_db_pool():
+    try:
+        if DB_CONFIG.get('password'):
+            db_pool = pooling.MySQLConnectionPool(**DB_CONFIG)
+            logger.info("✅ Database connection pool created successfully")
+            return db_pool
         logger.warning("DB_PASSWORD not set; skipping pool creation and using direct connection fallback.")
-except MySQLError as err:
-    logger.error(f"❌ DB pool creation failed: {err}. Using direct connection fallback.")
+    except MySQLError as err:
+        logger.error(f"❌ DB pool creation failed: {err}. Using direct connection fallback.")
+    return None
+
+def close_db_pool():
+    """Closes this process's pooled connections (before forking workers)"""
+    global pool, pool_pid
+    if pool:
+        try:
+            pool._remove_connections()
+        except Exception as e:
+            logger.warning(f"⚠️ Closing DB pool failed: {e}")
+    pool, pool_pid = None, None
 
 def direct_connect():
     # Production-ready connection without hardcoded passwords
@@ -143,6 +168,9 @@ def direct_connect():
         return None
 
 def get_db_connection():
+    global pool, pool_pid
+    if pool_pid != os.getpid():
+        pool, pool_pid = create_db_pool(), os.getpid()
     if pool:
         try:
             return pool.get_connection()
@@ -358,6 +386,41 @@ def init_db():
         ) ENGINE=InnoDB
         """)
 
+        # Per-session summary of chat_history, kept current by insert_chat_messages and the deletes
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS chat_sessions (
+            user_id INT NOT NULL,
+            session_id VARCHAR(255) NOT NULL,
+            last_message DATETIME NOT NULL,
+            message_count INT NOT NULL DEFAULT 0,
+            title VARCHAR(50) DEFAULT NULL,
+            PRIMARY KEY (user_id, session_id),
+            INDEX idx_user_last_message (user_id, last_message),
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        ) ENGINE=InnoDB
+        """)
+        # Build the summary from existing history the first time the table is created. Every
+        # worker runs init_db: the named lock lets one of them do it, and the check is repeated
+        # under the lock so the others find the table filled and leave it alone
+        cur.execute("SELECT GET_LOCK('chat_sessions_backfill', 60)")
+        if cur.fetchone()[0] != 1:
+            logger.warning("⚠️ Timed out waiting for the chat_sessions backfill lock; skipping backfill")
+        else:
+            try:
+                conn.start_transaction()
+                cur.execute("SELECT EXISTS(SELECT 1 FROM chat_sessions), EXISTS(SELECT 1 FROM chat_history)")
+                has_sessions, has_history = cur.fetchone()
+                sessions = backfill_chat_sessions(cur) if has_history and not has_sessions else None
+                conn.commit()
+                if sessions is not None:
+                    logger.info(f"✅ Backfilled {sessions} chat sessions")
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cur.execute("SELECT RELEASE_LOCK('chat_sessions_backfill')")
+                cur.fetchone()
+
         # Default users
         defaults = [
             ('admin', 'admin@hospital.com', 'admin123', 'Administrator', 'admin'),
@@ -816,6 +879,14 @@ def api_health_metrics():
         except:
             pass
 
+# ============================================================
+# Outbound HTTP (shared connection pool)
+# ============================================================
+http_client = HttpClient(
+    pool_maxsize=int(env('HTTP_POOL_SIZE', '20')),
+    retries=int(env('HTTP_RETRIES', '2'))
+)
+
 # ============================================================
 # Connect to IPFS
 # ============================================================
@@ -826,6 +897,7 @@ def get_ipfs_client():
         # Try local IPFS node first (for development)
         if not env('RAILWAY_ENVIRONMENT') and not env('RENDER') and not env('HEROKU') and not env('RENDER_SERVICE_NAME'):
             try:
+                import ipfshttpclient
                 client = ipfshttpclient.connect('/ip4/127.0.0.1/tcp/5001')
                 # Test connection
                 client.version()
@@ -845,6 +917,7 @@ def get_ipfs_client():
                 auth_bytes = auth_string.encode('ascii')
                 auth_header = base64.b64encode(auth_bytes).decode('ascii')
                 
+                import ipfshttpclient
                 client = ipfshttpclient.connect(
                     '/dns/ipfs.infura.io/tcp/5001/https',
                     headers={'Authorization': f'Basic {auth_header}'}
@@ -893,7 +966,7 @@ def upload_to_pinata(file_content, filename):
         'file': (filename, file_content, 'application/pdf')
     }
     
-    response = requests.post(url, files=files, headers=headers, timeout=30)
+    response = http_client.post(url, files=files, headers=headers)
     response.raise_for_status()
     
     result = response.json()
@@ -989,61 +1062,316 @@ def build_gateway_url(cid, mode=None):
 # ============================================================
 # RATE LIMITING & SMART FALLBACKS FOR FREE TIER
 # ============================================================
-import time
+import atexit
+import gc
 import hashlib
-from collections import deque
-from threading import Lock
-
-class RateLimiter:
-    def __init__(self, max_requests=25, time_window=60):
-        self.max_requests = max_requests
-        self.time_window = time_window
-        self.requests = deque()
+from email.utils import parsedate_to_datetime
+from collections import deque, OrderedDict
+from threading import Lock, Thread
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from src.cache_backends import create_backend
+from src.semantic_cache import SemanticCache
+from src.write_behind import WriteBehindQueue
+from src.rate_limiter import TokenBucketLimiter, MemoryBucketStore, create_bucket_store
+
+class ResponseCache:
+    """
+    Thread-safe LRU cache for chat responses with per-entry TTL and a byte budget.
+    get/set are O(1): entries live in an OrderedDict kept in recency order.
+
+    With a shared backend (see src/cache_backends.py) entries live there instead, so every
+    worker sees them. Keys cover the query, a hash of the PDF context, the model and the
+    prompt variant, so answers are never shared across documents, models or prompt templates.
+    """
+    def __init__(self, max_size=1000, ttl=3600, max_bytes=16 * 1024 * 1024, backend=None):
+        self.cache = OrderedDict()  # key -> (response, expires_at, size_bytes)
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.backend = backend
         self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def get_cache_key(self, query, context=None, model=None, variant=None):
+        context_hash = hashlib.sha256(context.encode()).hexdigest() if context else ''
+        content = f"{variant or ''}||{model or ''}||{query}||{context_hash}"
+        return hashlib.md5(content.encode()).hexdigest()
     
-    def can_make_request(self):
+    def get(self, query, context=None, model=None, variant=None):
+        key = self.get_cache_key(query, context, model, variant)
+        if self.backend is not None:
+            return self._backend_get(key)
         with self.lock:
-            now = time.time()
-            while self.requests and self.requests[0] <= now - self.time_window:
-                self.requests.popleft()
-            
-            if len(self.requests) < self.max_requests:
-                self.requests.append(now)
-                return True
-            return False
+            entry = self.cache.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            response, expires_at, _ = entry
+            if expires_at is not None and expires_at <= time.time():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return response
     
-    def wait_time(self):
+    def set(self, query, response, context=None, model=None, variant=None, ttl=None):
+        key = self.get_cache_key(query, context, model, variant)
+        ttl = self.ttl if ttl is None else ttl
+        if self.backend is not None:
+            self._backend_set(key, str(response), ttl)
+            return
+        size = len(key) + len(str(response).encode('utf-8'))
+        if size > self.max_bytes:
+            return
         with self.lock:
-            if not self.requests:
-                return 0
-            return max(0, self.time_window - (time.time() - self.requests[0]))
+            if key in self.cache:
+                self._remove(key)
+            self.cache[key] = (response, time.time() + ttl if ttl else None, size)
+            self.total_bytes += size
+            while len(self.cache) > self.max_size or self.total_bytes > self.max_bytes:
+                oldest_key = next(iter(self.cache))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def _backend_get(self, key):
+        try:
+            response = self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"Response cache read failed ({self.backend.name}): {e}")
+            response = None
+        with self.lock:
+            if response is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return response
 
-class ResponseCache:
-    def __init__(self, max_size=1000):
-        self.cache = {}
-        self.max_size = max_size
-        self.access_times = {}
+    def _backend_set(self, key, response, ttl):
+        try:
+            self.backend.set(key, response, ttl)
+        except Exception as e:
+            logger.warning(f"Response cache write failed ({self.backend.name}): {e}")
+
+    def _remove(self, key):
+        _, _, size = self.cache.pop(key)
+        self.total_bytes -= size
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+            return
+        with self.lock:
+            self.cache.clear()
+            self.total_bytes = 0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            stats = {
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+            if self.backend is None:
+                stats.update({
+                    'backend': 'memory',
+                    'entries': len(self.cache),
+                    'max_entries': self.max_size,
+                    'bytes': self.total_bytes,
+                    'max_bytes': self.max_bytes,
+                    'evictions': self.evictions,
+                    'expirations': self.expirations
+                })
+                return stats
+        try:
+            stats.update(self.backend.stats())
+        except Exception as e:
+            stats['backend_error'] = str(e)
+        return stats
+
+class ProviderError(Exception):
+    """Inference provider failure, carrying the HTTP status and Retry-After hint when known"""
+    def __init__(self, message, status_code=None, retry_after=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
     
-    def get_cache_key(self, query, context=None):
-        content = f"{query}||{context or ''}"
-        return hashlib.md5(content.encode()).hexdigest()
+    @classmethod
+    def wrap(cls, prefix, error):
+        """Builds a ProviderError from a requests/Groq SDK exception"""
+        if isinstance(error, cls):
+            return error
+        response = getattr(error, 'response', None)
+        status_code = getattr(error, 'status_code', None) or getattr(response, 'status_code', None)
+        headers = getattr(response, 'headers', None) or {}
+        return cls(f"{prefix}: {str(error)}", status_code, parse_retry_after(headers.get('Retry-After')))
     
-    def get(self, query, context=None):
-        key = self.get_cache_key(query, context)
-        if key in self.cache:
-            self.access_times[key] = time.time()
-            return self.cache[key]
+    @property
+    def kind(self):
+        """'rate_limit' (429), 'auth' (401/403), 'client' (other 4xx) or 'server' (5xx, timeouts, network)"""
+        if self.status_code == 429:
+            return 'rate_limit'
+        if self.status_code in (401, 403):
+            return 'auth'
+        if self.status_code and 400 <= self.status_code < 500 and self.status_code != 408:
+            return 'client'
+        return 'server'
+
+def parse_retry_after(value):
+    """Retry-After is either delay-seconds or an HTTP date; returns seconds or None"""
+    if not value:
         return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class CircuitBreaker:
+    """
+    Per-provider circuit breaker.
     
-    def set(self, query, response, context=None):
-        key = self.get_cache_key(query, context)
-        if len(self.cache) >= self.max_size:
-            oldest_key = min(self.access_times.keys(), key=lambda k: self.access_times[k])
-            del self.cache[oldest_key]
-            del self.access_times[oldest_key]
-        
-        self.cache[key] = response
-        self.access_times[key] = time.time()
+    closed    -> requests flow; consecutive server errors are counted
+    open      -> requests are refused until the cooldown passes
+    half_open -> a single probe request is let through; success closes, failure reopens
+    
+    Cooldowns back off exponentially with each consecutive trip, and a 429's Retry-After
+    is honoured as given. Client errors (bad request) are the caller's fault and don't
+    count against the provider; auth errors open the breaker for the maximum cooldown.
+    """
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+    
+    def __init__(self, name, failure_threshold=3, base_cooldown=15, max_cooldown=600):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.open_until = 0
+        self.probe_in_flight = False
+        self.last_error = None
+        self.transitions = deque(maxlen=20)
+        self.lock = Lock()
+    
+    def _transition(self, state, reason):
+        if state != self.state:
+            self.transitions.append({'at': datetime.now().isoformat(), 'from': self.state, 'to': state, 'reason': reason})
+            logger.info(f"🔌 Circuit {self.name}: {self.state} -> {state} ({reason})")
+            self.state = state
+    
+    def _open(self, cooldown, reason):
+        self.trips += 1
+        self.open_until = time.time() + min(self.max_cooldown, cooldown)
+        self.probe_in_flight = False
+        self._transition(self.OPEN, reason)
+    
+    def allow_request(self):
+        """True if a request may go to this provider now. In half-open this claims the probe."""
+        with self.lock:
+            if self.state == self.OPEN:
+                if time.time() < self.open_until:
+                    return False
+                self._transition(self.HALF_OPEN, 'cooldown elapsed')
+            if self.state == self.HALF_OPEN:
+                if self.probe_in_flight:
+                    return False
+                self.probe_in_flight = True
+            return True
+    
+    def release_probe(self):
+        """Gives back a half-open probe claimed by allow_request but never used"""
+        with self.lock:
+            self.probe_in_flight = False
+    
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.trips = 0
+            self.probe_in_flight = False
+            self._transition(self.CLOSED, 'request succeeded')
+    
+    def record_failure(self, error):
+        kind = error.kind if isinstance(error, ProviderError) else 'server'
+        retry_after = error.retry_after if isinstance(error, ProviderError) else None
+        with self.lock:
+            self.last_error = f"{kind}: {error}"
+            backoff = self.base_cooldown * (2 ** self.trips)
+            if kind == 'client':
+                self.probe_in_flight = False
+                return
+            if kind == 'rate_limit':
+                self._open(retry_after if retry_after is not None else backoff, 'rate limited (429)')
+            elif kind == 'auth':
+                self._open(self.max_cooldown, 'authentication failed')
+            elif self.state == self.HALF_OPEN:
+                self._open(backoff, 'probe failed')
+            else:
+                self.failures += 1
+                if self.failures >= self.failure_threshold:
+                    self._open(backoff, f"{self.failures} consecutive errors")
+    
+    def snapshot(self):
+        with self.lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.failures,
+                'trips': self.trips,
+                'retry_in_seconds': max(0.0, self.open_until - time.time()) if self.state == self.OPEN else 0.0,
+                'last_error': self.last_error,
+                'transitions': list(self.transitions)
+            }
+
+class LatencyHistogram:
+    """Per-provider latency: fixed buckets for reporting plus a recent window for percentiles"""
+    BUCKETS_MS = (250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+    
+    def __init__(self, window=200):
+        self.counts = [0] * (len(self.BUCKETS_MS) + 1)
+        self.recent = deque(maxlen=window)
+        self.total = 0
+        self.sum_ms = 0.0
+        self.lock = Lock()
+    
+    def record(self, seconds):
+        ms = seconds * 1000
+        with self.lock:
+            idx = next((i for i, bound in enumerate(self.BUCKETS_MS) if ms <= bound), len(self.BUCKETS_MS))
+            self.counts[idx] += 1
+            self.recent.append(ms)
+            self.total += 1
+            self.sum_ms += ms
+    
+    def percentile(self, q, default=None):
+        with self.lock:
+            if len(self.recent) < 10:
+                return default
+            ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    
+    def snapshot(self):
+        labels = [f"<={b}ms" for b in self.BUCKETS_MS] + [f">{self.BUCKETS_MS[-1]}ms"]
+        with self.lock:
+            counts = dict(zip(labels, self.counts))
+            total, mean = self.total, (self.sum_ms / self.total if self.total else None)
+        return {
+            'count': total,
+            'mean_ms': mean,
+            'p50_ms': self.percentile(0.50),
+            'p95_ms': self.percentile(0.95),
+            'buckets': counts
+        }
 
 class MultiAPIManager:
     """Manages multiple inference providers as fallbacks"""
@@ -1053,141 +1381,234 @@ class MultiAPIManager:
             {
                 'name': 'groq',
                 'enabled': bool(env('GROQ_API_KEY')),
-                'rate_limiter': RateLimiter(max_requests=25, time_window=60),
-                'error_count': 0
+                'rate_limiter': TokenBucketLimiter(
+                    'groq',
+                    requests_per_minute=int(env('GROQ_RPM', '25')),
+                    tokens_per_minute=int(env('GROQ_TPM', '6000')),
+                    store=rate_limit_store
+                ),
+                'breaker': CircuitBreaker('groq'),
+                'usage': {'calls': 0, 'prompt_tokens': 0, 'completion_tokens': 0},
+                'latency': LatencyHistogram()
             },
             {
                 'name': 'openrouter',
                 'enabled': bool(env('OPENROUTER_API_KEY')),
-                'rate_limiter': RateLimiter(max_requests=200, time_window=60),
-                'error_count': 0
+                'rate_limiter': TokenBucketLimiter(
+                    'openrouter',
+                    requests_per_minute=int(env('OPENROUTER_RPM', '200')),
+                    store=rate_limit_store
+                ),
+                'breaker': CircuitBreaker('openrouter'),
+                'usage': {'calls': 0, 'prompt_tokens': 0, 'completion_tokens': 0},
+                'latency': LatencyHistogram()
             }
         ]
         self.current_provider_index = 0
+        self.lock = Lock()
     
-    def get_available_provider(self):
-        """Get next available provider"""
-        attempts = 0
-        while attempts < len(self.providers):
-            provider = self.providers[self.current_provider_index]
+    def get_available_provider(self, exclude=(), tokens=0, max_wait=None):
+        """
+        Get next available provider, skipping any named in exclude or with an open circuit.
+        
+        Args:
+            exclude (iterable): Provider names not to use.
+            tokens (int): Estimated tokens for the call, charged to the provider's budget.
+            max_wait (float): Seconds to queue for a provider's budget before moving on to
+                the next one. Defaults to RATE_LIMIT_MAX_WAIT.
+        """
+        if max_wait is None:
+            max_wait = RATE_LIMIT_MAX_WAIT
+        with self.lock:
+            start = self.current_provider_index
+        
+        # Queueing happens outside the manager lock so other requests aren't held up
+        for offset in range(len(self.providers)):
+            index = (start + offset) % len(self.providers)
+            provider = self.providers[index]
             
-            if not provider['enabled'] or provider['error_count'] > 3:
-                self.current_provider_index = (self.current_provider_index + 1) % len(self.providers)
-                attempts += 1
+            if not provider['enabled'] or provider['name'] in exclude or not provider['breaker'].allow_request():
                 continue
             
-            if provider['rate_limiter'].can_make_request():
+            if provider['rate_limiter'].acquire(tokens, max_wait=max_wait):
+                with self.lock:
+                    self.current_provider_index = index
                 return provider
-            
-            self.current_provider_index = (self.current_provider_index + 1) % len(self.providers)
-            attempts += 1
+            provider['breaker'].release_probe()
         
         return None
     
+    def advance(self):
+        """Moves the rotation past the current provider"""
+        with self.lock:
+            self.current_provider_index = (self.current_provider_index + 1) % len(self.providers)
+    
     def mark_error(self, provider_name, error):
-        for provider in self.providers:
-            if provider['name'] == provider_name:
-                provider['error_count'] += 1
-                logger.error(f"Provider {provider_name} error #{provider['error_count']}: {error}")
-                break
+        provider = self.get_provider(provider_name)
+        if provider:
+            provider['breaker'].record_failure(error)
+            logger.error(f"Provider {provider_name} error ({provider['breaker'].state}): {error}")
     
     def reset_errors(self, provider_name):
-        for provider in self.providers:
-            if provider['name'] == provider_name:
-                provider['error_count'] = 0
-                break
-
-def call_groq_api(prompt, max_tokens=500):
-    """Primary Groq API call with intelligent RAG enhancement"""
-    try:
-        # Use existing RAG pipeline or initialize if needed
-        pipeline = rag_pipeline if rag_pipeline is not None else initialize_rag_pipeline()
-        
-        # Analyze if user wants detailed info
-        query_lower = prompt.lower()
-        wants_details = any(word in query_lower for word in [
-            'detailed', 'details', 'explain in detail', 'comprehensive', 'elaborate', 
-            'side effects', 'interactions', 'dosage', 'dose', 'how much', 
-            'precautions', 'warnings', 'contraindications', 'tell me everything'
-        ])
-        
-        # Check if it's a medicine-related query that might benefit from RAG
-        is_medicine_query = any(word in query_lower for word in [
-            'paracip', 'paracetamol', 'aspirin', 'ibuprofen', 'medicine', 'medication', 
-            'drug', 'tablet', 'capsule', 'syrup', 'what is', 'tell me about',
-            'azithromycin', 'cetirizine', 'metformin', 'diclofenac', 'nimesulide',
-            'aceclofenac', 'amoxycillin', 'glimepiride', 'pantoprazole', 'omeprazole',
-            'atorvastatin', 'losartan', 'cyra', 'domperidone', 'rabeprazole'
-        ])
-        
-        rag_context = None
-        use_rag = False
-        
-        if is_medicine_query:
-            # Try to get RAG context for medicine queries
-            try:
-                rag_context = pipeline.run(prompt, context=None)
-                logger.info(f"RAG context retrieved for '{prompt}': {rag_context[:200]}...")
+        provider = self.get_provider(provider_name)
+        if provider:
+            provider['breaker'].record_success()
+    
+    def record_usage(self, provider_name, prompt_tokens, completion_tokens):
+        provider = self.get_provider(provider_name)
+        if provider:
+            with self.lock:
+                usage = provider['usage']
+                usage['calls'] += 1
+                usage['prompt_tokens'] += prompt_tokens or 0
+                usage['completion_tokens'] += completion_tokens or 0
+    
+    def get_provider(self, provider_name):
+        return next((p for p in self.providers if p['name'] == provider_name), None)
+    
+    def record_latency(self, provider_name, seconds):
+        provider = self.get_provider(provider_name)
+        if provider:
+            provider['latency'].record(seconds)
+    
+    def hedge_delay(self, provider_name):
+        """Seconds to wait on provider_name before hedging: its recent p95, clamped"""
+        provider = self.get_provider(provider_name)
+        default_ms = float(env('HEDGE_DEFAULT_DELAY_MS', '3000'))
+        p95 = provider['latency'].percentile(HEDGE_PERCENTILE, default_ms) if provider else default_ms
+        return max(HEDGE_MIN_DELAY_MS, p95) / 1000.0
+    
+    def _usage_snapshot(self, provider):
+        with self.lock:
+            usage = dict(provider['usage'])
+        calls = usage['calls']
+        usage['avg_prompt_tokens'] = usage['prompt_tokens'] / calls if calls else 0
+        usage['avg_completion_tokens'] = usage['completion_tokens'] / calls if calls else 0
+        return usage
+    
+    def status(self):
+        return [{
+            'name': p['name'],
+            'enabled': p['enabled'],
+            'circuit': p['breaker'].snapshot(),
+            'rate_limit': p['rate_limiter'].stats(),
+            'usage': self._usage_snapshot(p),
+            'latency': p['latency'].snapshot()
+        } for p in self.providers]
+
+GROQ_MODEL = "llama-3.1-8b-instant"
+
+def rag_context_for(pipeline, prompt):
+    """
+    Database facts for a medicine question, from RAGPipeline.retrieve (no generation).
+    Returns None when nothing relevant was found.
+    """
+    retrieval = pipeline.retrieve(prompt)
+    if retrieval['answer']:
+        # Price and alternative questions are answered straight from the catalogue
+        return retrieval['answer']
+    
+    parts = []
+    if retrieval['generics']:
+        parts.append(f"Matched generic medicine(s): {', '.join(retrieval['generics'])}")
+    for brand, salts in retrieval['salts'].items():
+        parts.append(f"Brand '{brand}' contains salt(s): {', '.join(salts) or 'not listed'}")
+    context = retrieval['context']
+    if context and context != "No relevant information found in the database.":
+        parts.append(context)
+    return "\n".join(parts) or None
+
+def build_groq_prompt(prompt, max_tokens=500):
+    """Builds the RAG-enhanced Groq prompt. Returns (pipeline, enhanced_prompt, max_tokens)."""
+    # Use existing RAG pipeline or initialize if needed
+    pipeline = rag_pipeline if rag_pipeline is not None else initialize_rag_pipeline()
+    
+    # Analyze if user wants detailed info
+    query_lower = prompt.lower()
+    wants_details = any(word in query_lower for word in [
+        'detailed', 'details', 'explain in detail', 'comprehensive', 'elaborate', 
+        'side effects', 'interactions', 'dosage', 'dose', 'how much', 
+        'precautions', 'warnings', 'contraindications', 'tell me everything'
+    ])
+    
+    # Check if it's a medicine-related query that might benefit from RAG
+    is_medicine_query = any(word in query_lower for word in [
+        'paracip', 'paracetamol', 'aspirin', 'ibuprofen', 'medicine', 'medication', 
+        'drug', 'tablet', 'capsule', 'syrup', 'what is', 'tell me about',
+        'azithromycin', 'cetirizine', 'metformin', 'diclofenac', 'nimesulide',
+        'aceclofenac', 'amoxycillin', 'glimepiride', 'pantoprazole', 'omeprazole',
+        'atorvastatin', 'losartan', 'cyra', 'domperidone', 'rabeprazole'
+    ])
+    
+    rag_context = None
+    use_rag = False
+    
+    if is_medicine_query:
+        # Retrieval only: the single completion below is the only LLM call for this query
+        try:
+            rag_context = rag_context_for(pipeline, prompt)
+            if rag_context:
+                use_rag = True
+                logger.info(f"✅ RAG context retrieved for '{prompt}': {rag_context[:200]}...")
+            else:
+                logger.info("⚠️ RAG didn't find specific medicine info, using general AI knowledge")
                 
-                # Check if RAG found relevant information (more strict checking)
-                if (rag_context and 
-                    len(rag_context.strip()) > 50 and 
-                    not rag_context.lower().startswith("i don't have") and
-                    not "i don't have information" in rag_context.lower() and
-                    not "no information available" in rag_context.lower()):
-                    use_rag = True
-                    logger.info("✅ RAG found relevant medicine information")
-                else:
-                    logger.info("⚠️ RAG didn't find specific medicine info, using general AI knowledge")
-                    
-            except Exception as e:
-                logger.warning(f"RAG context retrieval failed: {e}")
-                logger.info("📚 Falling back to general AI knowledge")
-        
-        # Construct the appropriate prompt based on available information
-        if use_rag and rag_context:
-            # Use RAG-enhanced response for medicines in database
-            if wants_details:
-                enhanced_prompt = f"""You are a knowledgeable medical assistant. Based on the following medical database information, provide a comprehensive and detailed response about: {prompt}
+        except Exception as e:
+            logger.warning(f"RAG context retrieval failed: {e}")
+            logger.info("📚 Falling back to general AI knowledge")
+    
+    # Construct the appropriate prompt based on available information
+    if use_rag and rag_context:
+        # Use RAG-enhanced response for medicines in database
+        if wants_details:
+            enhanced_prompt = f"""You are a knowledgeable medical assistant. Based on the following medical database information, provide a comprehensive and detailed response about: {prompt}
 
 Medical Database Information:
 {rag_context}
 
 Provide thorough information including dosages, uses, precautions, side effects, and interactions. Be detailed but well-organized."""
-            else:
-                enhanced_prompt = f"""You are a friendly medical assistant. Based on the following medical database information, provide a brief, conversational response about: {prompt}
+        else:
+            enhanced_prompt = f"""You are a friendly medical assistant. Based on the following medical database information, provide a brief, conversational response about: {prompt}
 
 Medical Database Information:
 {rag_context}
 
 Give a concise answer in 2-3 sentences maximum. Just explain what it is and its main use. Don't include detailed dosages, side effects, or precautions unless specifically asked. End by mentioning they can ask for more details if needed."""
-        
-        elif is_medicine_query:
-            # Medicine query but no RAG data - use general AI knowledge
-            if wants_details:
-                enhanced_prompt = f"""You are a knowledgeable medical assistant. The user is asking about: {prompt}
+    
+    elif is_medicine_query:
+        # Medicine query but no RAG data - use general AI knowledge
+        if wants_details:
+            enhanced_prompt = f"""You are a knowledgeable medical assistant. The user is asking about: {prompt}
 
 Please provide helpful general medical information based on your knowledge. Include what you know about dosages, uses, precautions, and interactions when applicable.
 
 If you're not certain about specific details, mention that the user should consult healthcare professionals or official medical sources."""
-            else:
-                enhanced_prompt = f"""You are a friendly medical assistant. The user is asking about: {prompt}
+        else:
+            enhanced_prompt = f"""You are a friendly medical assistant. The user is asking about: {prompt}
 
 Please provide a brief, helpful response based on your general medical knowledge. Keep it conversational and mention they can ask for more details if needed. If you're not certain about specific details, suggest consulting healthcare professionals."""
-        
-        else:
-            # Non-medicine queries - use general AI knowledge
-            enhanced_prompt = f"""You are a friendly medical assistant. Respond conversationally to: {prompt}
+    
+    else:
+        # Non-medicine queries - use general AI knowledge
+        enhanced_prompt = f"""You are a friendly medical assistant. Respond conversationally to: {prompt}
 
 Be helpful and informative using your general medical knowledge. Keep the tone natural and conversational. If they need more details, let them know they can ask for more specific information."""
-        
+    
+    return pipeline, enhanced_prompt, (max_tokens if wants_details else 200)
+
+def call_groq_api(prompt, max_tokens=500):
+    """Primary Groq API call with intelligent RAG enhancement"""
+    try:
+        pipeline, enhanced_prompt, max_tokens = build_groq_prompt(prompt, max_tokens)
         result = pipeline.client.chat.completions.create(
-            model="llama-3.1-8b-instant",
+            model=GROQ_MODEL,
             messages=[{"role": "user", "content": enhanced_prompt}],
             temperature=0.7,
-            max_tokens=max_tokens if wants_details else 200,
+            max_tokens=max_tokens,
             top_p=0.9
         )
+        if result.usage:
+            api_manager.record_usage('groq', result.usage.prompt_tokens, result.usage.completion_tokens)
         
         response_content = result.choices[0].message.content.strip()
         
@@ -1195,99 +1616,285 @@ Be helpful and informative using your general medical knowledge. Keep the tone n
         return response_content
         
     except Exception as e:
-        raise Exception(f"Groq API error: {str(e)}")
+        raise ProviderError.wrap("Groq API error", e)
 
-def call_openrouter_api(prompt, max_tokens=500):
-    """OpenRouter API with intelligent medicine detection"""
+def stream_groq_api(prompt, max_tokens=500):
+    """Streaming variant of call_groq_api: yields tokens as Groq generates them"""
+    try:
+        pipeline, enhanced_prompt, max_tokens = build_groq_prompt(prompt, max_tokens)
+        stream = pipeline.client.chat.completions.create(
+            model=GROQ_MODEL,
+            messages=[{"role": "user", "content": enhanced_prompt}],
+            temperature=0.7,
+            max_tokens=max_tokens,
+            top_p=0.9,
+            stream=True
+        )
+        for chunk in stream:
+            token = chunk.choices[0].delta.content
+            if token:
+                yield token
+    except Exception as e:
+        raise ProviderError.wrap("Groq API error", e)
+
+OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+OPENROUTER_MODEL = "microsoft/wizardlm-2-8x22b:free"
+
+def build_openrouter_request(prompt, max_tokens=500):
+    """Builds (headers, payload) for an OpenRouter chat completion"""
     api_key = env('OPENROUTER_API_KEY')
     if not api_key:
         raise Exception("OpenRouter API key not configured")
     
+    # Check if it's a medicine query
+    query_lower = prompt.lower()
+    is_medicine_query = any(word in query_lower for word in [
+        'paracip', 'paracetamol', 'aspirin', 'ibuprofen', 'medicine', 'medication', 
+        'drug', 'tablet', 'capsule', 'syrup', 'what is', 'tell me about',
+        'azithromycin', 'cetirizine', 'metformin', 'diclofenac', 'nimesulide',
+        'cyra', 'domperidone', 'rabeprazole'
+    ])
+    
+    if is_medicine_query:
+        system_prompt = f"You are a knowledgeable medical assistant. Provide helpful information about the medical question: {prompt}. Use your general medical knowledge and mention when users should consult healthcare professionals for specific advice."
+    else:
+        system_prompt = f"You are a friendly medical assistant. Respond conversationally to this health-related question: {prompt}"
+    
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+        "HTTP-Referer": "http://localhost:5000",
+        "X-Title": "MediCare AI Assistant"
+    }
+    
+    payload = {
+        "model": OPENROUTER_MODEL,
+        "messages": [{"role": "user", "content": system_prompt}],
+        "max_tokens": max_tokens,
+        "temperature": 0.7
+    }
+    return headers, payload
+
+def call_openrouter_api(prompt, max_tokens=500):
+    """OpenRouter API with intelligent medicine detection"""
+    headers, payload = build_openrouter_request(prompt, max_tokens)
+    
     try:
-        # Check if it's a medicine query
-        query_lower = prompt.lower()
-        is_medicine_query = any(word in query_lower for word in [
-            'paracip', 'paracetamol', 'aspirin', 'ibuprofen', 'medicine', 'medication', 
-            'drug', 'tablet', 'capsule', 'syrup', 'what is', 'tell me about',
-            'azithromycin', 'cetirizine', 'metformin', 'diclofenac', 'nimesulide',
-            'cyra', 'domperidone', 'rabeprazole'
-        ])
-        
-        if is_medicine_query:
-            system_prompt = f"You are a knowledgeable medical assistant. Provide helpful information about the medical question: {prompt}. Use your general medical knowledge and mention when users should consult healthcare professionals for specific advice."
-        else:
-            system_prompt = f"You are a friendly medical assistant. Respond conversationally to this health-related question: {prompt}"
-        
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json",
-            "HTTP-Referer": "http://localhost:5000",
-            "X-Title": "MediCare AI Assistant"
-        }
-        
-        payload = {
-            "model": "microsoft/wizardlm-2-8x22b:free",
-            "messages": [{"role": "user", "content": system_prompt}],
-            "max_tokens": max_tokens,
-            "temperature": 0.7
-        }
-        
-        response = requests.post(
-            "https://openrouter.ai/api/v1/chat/completions",
+        response = http_client.post(
+            OPENROUTER_URL,
             headers=headers,
-            json=payload,
-            timeout=30
+            json=payload
         )
         response.raise_for_status()
         
         result = response.json()
+        usage = result.get('usage') or {}
+        if usage:
+            api_manager.record_usage('openrouter', usage.get('prompt_tokens', 0), usage.get('completion_tokens', 0))
         content = result['choices'][0]['message']['content'].strip()
         
         # Return clean response without source indicators
         return content
         
     except Exception as e:
-        raise Exception(f"OpenRouter API error: {str(e)}")
+        raise ProviderError.wrap("OpenRouter API error", e)
+
+def stream_openrouter_api(prompt, max_tokens=500):
+    """Streaming variant of call_openrouter_api: relays tokens from OpenRouter's SSE stream"""
+    headers, payload = build_openrouter_request(prompt, max_tokens)
+    payload['stream'] = True
+    
+    try:
+        with http_client.post(OPENROUTER_URL, headers=headers, json=payload, stream=True) as response:
+            response.raise_for_status()
+            for line in response.iter_lines(decode_unicode=True):
+                # Blank keep-alives and ": OPENROUTER PROCESSING" comments carry no data
+                if not line or not line.startswith('data:'):
+                    continue
+                data = line[len('data:'):].strip()
+                if data == '[DONE]':
+                    break
+                chunk = json.loads(data)
+                if chunk.get('error'):
+                    raise Exception(chunk['error'])
+                token = chunk['choices'][0].get('delta', {}).get('content')
+                if token:
+                    yield token
+    except Exception as e:
+        raise ProviderError.wrap("OpenRouter API error", e)
+
+API_FUNCTIONS = {
+    'groq': call_groq_api,
+    'openrouter': call_openrouter_api
+}
+
+# Model behind each provider; cached answers are keyed on the one that wrote them
+PROVIDER_MODELS = {
+    'groq': GROQ_MODEL,
+    'openrouter': OPENROUTER_MODEL
+}
+
+# Hedged requests: if the first provider hasn't answered by its recent p95 latency,
+# fire the next available provider in parallel and take whichever answers first.
+HEDGE_REQUESTS = env('HEDGE_REQUESTS', 'false').lower() == 'true'
+HEDGE_PERCENTILE = float(env('HEDGE_PERCENTILE', '0.95'))
+HEDGE_MIN_DELAY_MS = float(env('HEDGE_MIN_DELAY_MS', '500'))
+hedge_executor = ThreadPoolExecutor(max_workers=int(env('HEDGE_WORKERS', '8')), thread_name_prefix='hedge')
+
+def timed_provider_call(provider_name, prompt, max_tokens):
+    """Runs one provider call, recording its latency and error bookkeeping"""
+    start = time.time()
+    try:
+        response = API_FUNCTIONS[provider_name](prompt, max_tokens)
+    except Exception as e:
+        api_manager.mark_error(provider_name, e)
+        raise
+    api_manager.record_latency(provider_name, time.time() - start)
+    api_manager.reset_errors(provider_name)
+    return response
 
 def call_with_fallback(prompt, max_tokens=500):
     """Try multiple inference providers until one succeeds"""
-    api_functions = {
-        'groq': call_groq_api,
-        'openrouter': call_openrouter_api
-    }
+    if HEDGE_REQUESTS:
+        return call_with_hedging(prompt, max_tokens)
     
     last_error = None
     
     for attempt in range(len(api_manager.providers)):
-        provider = api_manager.get_available_provider()
+        provider = api_manager.get_available_provider(tokens=estimate_tokens(prompt, max_tokens))
         
         if not provider:
             logger.error("All inference providers exhausted")
             break
         
         provider_name = provider['name']
-        api_function = api_functions.get(provider_name)
         
-        if not api_function:
+        if provider_name not in API_FUNCTIONS:
             logger.warning(f"No implementation for provider: {provider_name}")
             continue
         
         try:
             logger.info(f"Trying provider: {provider_name}")
-            response = api_function(prompt, max_tokens)
-            
-            # Success! Reset error count
-            api_manager.reset_errors(provider_name)
+            response = timed_provider_call(provider_name, prompt, max_tokens)
             logger.info(f"✅ Success with provider: {provider_name}")
             return response, provider_name
             
         except Exception as e:
-            api_manager.mark_error(provider_name, e)
             last_error = e
             logger.warning(f"❌ Provider {provider_name} failed: {e}")
             
             # Move to next provider
-            api_manager.current_provider_index = (api_manager.current_provider_index + 1) % len(api_manager.providers)
+            api_manager.advance()
+            continue
+    
+    # All providers failed
+    raise Exception(f"All inference providers failed. Last error: {last_error}")
+
+def call_with_hedging(prompt, max_tokens=500):
+    """
+    Hedged variant of call_with_fallback. A backup provider is only launched once the
+    in-flight one exceeds its p95 latency (or fails), and only if that provider's rate
+    limiter grants a slot, so hedging never exceeds a provider's quota. The first
+    successful answer wins; late answers are ignored.
+    """
+    in_flight = {}  # future -> provider name
+    tried = set()
+    last_error = None
+    
+    tokens = estimate_tokens(prompt, max_tokens)
+    
+    def launch():
+        # Only the first attempt queues for budget; a hedge is pointless if it has to wait
+        max_wait = 0 if in_flight else None
+        provider = api_manager.get_available_provider(exclude=tried, tokens=tokens, max_wait=max_wait)
+        while provider and provider['name'] not in API_FUNCTIONS:
+            tried.add(provider['name'])
+            provider = api_manager.get_available_provider(exclude=tried, tokens=tokens, max_wait=max_wait)
+        if not provider:
+            return False
+        name = provider['name']
+        tried.add(name)
+        logger.info(f"{'Hedging with' if in_flight else 'Trying'} provider: {name}")
+        in_flight[hedge_executor.submit(timed_provider_call, name, prompt, max_tokens)] = name
+        return True
+    
+    can_hedge = launch()
+    if not can_hedge:
+        logger.error("All inference providers exhausted")
+    while in_flight:
+        newest = list(in_flight.values())[-1]
+        timeout = api_manager.hedge_delay(newest) if can_hedge else None
+        done, _ = wait(list(in_flight), timeout=timeout, return_when=FIRST_COMPLETED)
+        if not done:
+            can_hedge = launch()
+            continue
+        for future in done:
+            name = in_flight.pop(future)
+            try:
+                response = future.result()
+            except Exception as e:
+                last_error = e
+                logger.warning(f"❌ Provider {name} failed: {e}")
+                continue
+            for other, other_name in in_flight.items():
+                # A hedge that never started must hand back any half-open probe it claimed
+                if other.cancel():
+                    api_manager.get_provider(other_name)['breaker'].release_probe()
+            logger.info(f"✅ Success with provider: {name}")
+            return response, name
+        # Everything that finished failed; fail over right away if nothing else is running
+        if not in_flight:
+            can_hedge = launch()
+    
+    raise Exception(f"All inference providers failed. Last error: {last_error}")
+
+def stream_with_fallback(prompt, max_tokens=500):
+    """
+    Streaming counterpart of call_with_fallback. Yields (provider_name, token).
+    A provider that fails before its first token is skipped for the next one; a failure
+    mid-stream is raised, since tokens already sent to the client can't be taken back.
+    """
+    stream_functions = {
+        'groq': stream_groq_api,
+        'openrouter': stream_openrouter_api
+    }
+    
+    last_error = None
+    
+    for attempt in range(len(api_manager.providers)):
+        provider = api_manager.get_available_provider(tokens=estimate_tokens(prompt, max_tokens))
+        
+        if not provider:
+            logger.error("All inference providers exhausted")
+            break
+        
+        provider_name = provider['name']
+        stream_function = stream_functions.get(provider_name)
+        
+        if not stream_function:
+            logger.warning(f"No streaming implementation for provider: {provider_name}")
+            continue
+        
+        started = False
+        try:
+            logger.info(f"Streaming from provider: {provider_name}")
+            for token in stream_function(prompt, max_tokens):
+                started = True
+                yield provider_name, token
+            
+            api_manager.reset_errors(provider_name)
+            logger.info(f"✅ Stream completed with provider: {provider_name}")
+            return
+            
+        except Exception as e:
+            api_manager.mark_error(provider_name, e)
+            last_error = e
+            logger.warning(f"❌ Provider {provider_name} stream failed: {e}")
+            if started:
+                raise
+            
+            # Move to next provider
+            api_manager.advance()
             continue
     
     # All providers failed
@@ -1399,9 +2006,60 @@ What would you like to know?"""
 # INITIALIZE GLOBAL INSTANCES
 # ============================================================
 
+def create_rate_limit_store():
+    """Provider quota buckets from RATE_LIMIT_BACKEND: memory (per process), sqlite (per host) or redis."""
+    kind = env('RATE_LIMIT_BACKEND', 'memory').lower()
+    try:
+        return create_bucket_store(
+            kind,
+            path=env('RATE_LIMIT_PATH', 'data/cache/rate_limits.sqlite3'),
+            url=env('REDIS_URL')
+        )
+    except Exception as e:
+        logger.warning(f"⚠️ Rate limit backend '{kind}' unavailable ({e}); quotas are per process")
+        return MemoryBucketStore()
+
+rate_limit_store = create_rate_limit_store()
+
+# Seconds a request will queue for its preferred provider's budget before failing over
+RATE_LIMIT_MAX_WAIT = float(env('RATE_LIMIT_MAX_WAIT', '3'))
+
 # Initialize new multi-API system
 api_manager = MultiAPIManager()
-response_cache = ResponseCache(max_size=500)
+
+def create_response_cache():
+    """Response cache from RESPONSE_CACHE_BACKEND: memory (per process), sqlite (per host) or redis."""
+    kind = env('RESPONSE_CACHE_BACKEND', 'memory').lower()
+    ttl = int(env('RESPONSE_CACHE_TTL', '3600'))
+    if kind != 'memory':
+        try:
+            backend = create_backend(
+                kind,
+                max_size=int(env('RESPONSE_CACHE_SIZE', '500')),
+                path=env('RESPONSE_CACHE_PATH', 'data/cache/response_cache.sqlite3'),
+                url=env('REDIS_URL')
+            )
+            return ResponseCache(ttl=ttl, backend=backend)
+        except Exception as e:
+            logger.warning(f"⚠️ Response cache backend '{kind}' unavailable ({e}); using in-process cache")
+    return ResponseCache(
+        max_size=int(env('RESPONSE_CACHE_SIZE', '500')),
+        ttl=ttl,
+        max_bytes=int(env('RESPONSE_CACHE_MAX_BYTES', str(16 * 1024 * 1024)))
+    )
+
+response_cache = create_response_cache()
+
+def estimate_tokens(prompt, max_tokens=500):
+    """Rough token budget for a call: ~4 characters per prompt token plus the completion cap"""
+    return len(prompt) // 4 + max_tokens
+# Embedding-keyed cache; gets its encoder once the RAG pipeline is up. Mode: off | shadow | on
+semantic_cache = SemanticCache(
+    threshold=float(env('SEMANTIC_CACHE_THRESHOLD', '0.95')),
+    mode=env('SEMANTIC_CACHE_MODE', 'shadow').lower(),
+    ttl=int(env('RESPONSE_CACHE_TTL', '3600')),
+    max_scopes=int(env('SEMANTIC_CACHE_MAX_SCOPES', '256'))
+)
 fallback_responder = SmartFallbackResponder()
 
 logger.info("✅ Initialized API management system with smart fallbacks")
@@ -1456,24 +2114,62 @@ def log_api_usage(provider, success, error=None):
 # ============================================================
 # CHAT HISTORY FUNCTIONS
 # ============================================================
-def save_chat_message(user_id, session_id, message_type, message_content, pdf_cid=None):
-    """Save a chat message to the database"""
+# Chat messages are queued per worker process and written in batches. Only the worker that
+# queued a row can see it before it reaches MySQL, and a session's next request may land on
+# another worker. So saving an AI reply, which ends a chat turn, waits for the session's
+# queued rows to be written before the response goes out.
+CHAT_WRITE_BEHIND = env('CHAT_WRITE_BEHIND', 'true').lower() == 'true'
+# How long a history read, or the end of a chat turn, waits for queued messages to be written
+CHAT_WRITE_READ_WAIT = float(env('CHAT_WRITE_READ_WAIT', '2'))
+
+def chat_session_updates(rows):
+    """
+    Folds chat_history rows into one chat_sessions update per session.
+
+    Returns:
+        list: (user_id, session_id, last_message, message_count, title) tuples, where
+            message_count is the number of new rows and title the first new user message.
+    """
+    sessions = {}
+    for user_id, session_id, message_type, content, _, timestamp in rows:
+        last, count, title = sessions.get((user_id, session_id), (timestamp, 0, None))
+        if title is None and message_type == 'user':
+            title = content[:50]
+        sessions[(user_id, session_id)] = (max(last, timestamp), count + 1, title)
+    return [(user_id, session_id, *summary) for (user_id, session_id), summary in sessions.items()]
+
+def insert_chat_messages(rows):
+    """
+    Writes chat_history rows in one multi-row INSERT and updates their chat_sessions
+    summaries in the same transaction.
+
+    Args:
+        rows (list): (user_id, session_id, message_type, message_content, pdf_cid, timestamp) tuples.
+    """
     conn = get_db_connection()
     if not conn:
-        logger.error("Cannot save chat message - no database connection")
-        return False
-    
+        raise MySQLError("no database connection")
     try:
+        # Connections are autocommit; without this each statement would commit by itself and
+        # a failed upsert would leave the history rows in, to be inserted again on retry
+        conn.start_transaction()
         cur = conn.cursor()
-        cur.execute("""
+        cur.executemany("""
             INSERT INTO chat_history (user_id, session_id, message_type, message_content, pdf_cid, timestamp)
             VALUES (%s, %s, %s, %s, %s, %s)
-        """, (user_id, session_id, message_type, message_content, pdf_cid, datetime.now()))
+        """, rows)
+        cur.executemany("""
+            INSERT INTO chat_sessions (user_id, session_id, last_message, message_count, title)
+            VALUES (%s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                last_message = GREATEST(last_message, VALUES(last_message)),
+                message_count = message_count + VALUES(message_count),
+                title = COALESCE(title, VALUES(title))
+        """, chat_session_updates(rows))
         conn.commit()
-        return True
-    except Exception as e:
-        logger.error(f"Error saving chat message: {e}")
-        return False
+    except Exception:
+        conn.rollback()
+        raise
     finally:
         try:
             cur.close()
@@ -1481,34 +2177,146 @@ def save_chat_message(user_id, session_id, message_type, message_content, pdf_ci
         except:
             pass
 
+# Off by default: the file holds patient chat content in plaintext and is never rotated.
+# Point it at a private, access-controlled path to keep messages the database refused.
+CHAT_DEAD_LETTER_PATH = env('CHAT_DEAD_LETTER_PATH', '')
+
+def dead_letter_chat_message(row, error):
+    """Appends a chat message the database refused to CHAT_DEAD_LETTER_PATH as a JSON line, for replay"""
+    user_id, session_id, message_type, message_content, pdf_cid, timestamp = row
+    os.makedirs(os.path.dirname(CHAT_DEAD_LETTER_PATH) or '.', exist_ok=True)
+    with open(CHAT_DEAD_LETTER_PATH, 'a', encoding='utf-8') as f:
+        f.write(json.dumps({
+            'user_id': user_id,
+            'session_id': session_id,
+            'message_type': message_type,
+            'message_content': message_content,
+            'pdf_cid': pdf_cid,
+            'timestamp': timestamp.isoformat(),
+            'error': str(error)
+        }) + '\n')
+
+chat_writer = WriteBehindQueue(
+    insert_chat_messages,
+    batch_size=int(env('CHAT_WRITE_BATCH_SIZE', '100')),
+    flush_interval=float(env('CHAT_WRITE_FLUSH_MS', '200')) / 1000,
+    max_size=int(env('CHAT_WRITE_QUEUE_SIZE', '5000')),
+    max_wait=float(env('CHAT_WRITE_MAX_WAIT', '2')),
+    max_attempts=int(env('CHAT_WRITE_MAX_ATTEMPTS', '3')),
+    dead_letter=dead_letter_chat_message if CHAT_DEAD_LETTER_PATH else None,
+    name='chat-writer',
+    logger=logger
+)
+# Write out whatever is still queued when the worker exits
+atexit.register(chat_writer.close)
+
+def flush_chat_writes(user_id, session_id=None, timeout=None):
+    """
+    Waits until this user's queued messages (in session_id, if given) are in the database.
+
+    Returns:
+        bool: False if some were still unwritten after the timeout.
+    """
+    return chat_writer.flush(
+        lambda row: row[0] == user_id and (session_id is None or row[1] == session_id),
+        timeout=CHAT_WRITE_READ_WAIT if timeout is None else timeout
+    )
+
+def save_chat_message(user_id, session_id, message_type, message_content, pdf_cid=None):
+    """
+    Save a chat message to the database.
+
+    With CHAT_WRITE_BEHIND the message is queued and chat_writer inserts it in a batch in
+    the background. It is written here, on the request thread, only if the queue stays
+    full for CHAT_WRITE_MAX_WAIT seconds.
+
+    An AI message ends a chat turn, so it also waits (up to CHAT_WRITE_READ_WAIT seconds) for
+    the whole session to be written. The next request can then read it from any worker.
+    """
+    row = (user_id, session_id, message_type, message_content, pdf_cid, datetime.now())
+    if CHAT_WRITE_BEHIND and chat_writer.submit(row):
+        if message_type == 'ai' and not flush_chat_writes(user_id, session_id):
+            logger.warning(f"Chat session {session_id} not yet written; other workers may not see it")
+        return True
+    try:
+        insert_chat_messages([row])
+        return True
+    except Exception as e:
+        logger.error(f"Error saving chat message: {e}")
+        return False
+
 def get_chat_history(user_id, session_id=None, limit=50):
-    """Retrieve chat history for a user"""
+    """Retrieve chat history for a user, including messages still queued for writing"""
+    # Read-your-writes on this worker: this user's queued messages go out first. If the DB
+    # can't take them in time, they are merged in from the queue instead. Other workers
+    # rely on turns being flushed when they end (see save_chat_message).
+    unwritten = []
+    if not flush_chat_writes(user_id, session_id):
+        unwritten = chat_writer.pending(
+            lambda row: row[0] == user_id and (session_id is None or row[1] == session_id)
+        )
+
+    rows = []
+    conn = get_db_connection()
+    if conn:
+        try:
+            cur = conn.cursor(dictionary=True)
+            if session_id:
+                cur.execute("""
+                    SELECT message_type, message_content, timestamp, pdf_cid
+                    FROM chat_history 
+                    WHERE user_id = %s AND session_id = %s
+                    ORDER BY timestamp ASC
+                    LIMIT %s
+                """, (user_id, session_id, limit))
+            else:
+                cur.execute("""
+                    SELECT session_id, message_type, message_content, timestamp, pdf_cid
+                    FROM chat_history 
+                    WHERE user_id = %s
+                    ORDER BY timestamp DESC
+                    LIMIT %s
+                """, (user_id, limit))
+            rows = cur.fetchall()
+        except Exception as e:
+            logger.error(f"Error retrieving chat history: {e}")
+        finally:
+            try:
+                cur.close()
+                conn.close()
+            except:
+                pass
+
+    if unwritten:
+        for _, row_session, message_type, content, pdf_cid, timestamp in unwritten:
+            message = {'message_type': message_type, 'message_content': content,
+                       'timestamp': timestamp, 'pdf_cid': pdf_cid}
+            if not session_id:
+                message['session_id'] = row_session
+            rows.append(message)
+        rows = sorted(rows, key=lambda m: m['timestamp'], reverse=not session_id)[:limit]
+    return rows
+
+def get_user_chat_sessions(user_id, limit=20):
+    """Get list of chat sessions for a user, most recent first"""
+    flush_chat_writes(user_id)
     conn = get_db_connection()
     if not conn:
         return []
     
     try:
         cur = conn.cursor(dictionary=True)
-        if session_id:
-            cur.execute("""
-                SELECT message_type, message_content, timestamp, pdf_cid
-                FROM chat_history 
-                WHERE user_id = %s AND session_id = %s
-                ORDER BY timestamp ASC
-                LIMIT %s
-            """, (user_id, session_id, limit))
-        else:
-            cur.execute("""
-                SELECT session_id, message_type, message_content, timestamp, pdf_cid
-                FROM chat_history 
-                WHERE user_id = %s
-                ORDER BY timestamp DESC
-                LIMIT %s
-            """, (user_id, limit))
+        cur.execute("""
+            SELECT session_id, last_message, message_count, title AS first_user_message
+            FROM chat_sessions
+            WHERE user_id = %s
+            ORDER BY last_message DESC
+            LIMIT %s
+        """, (user_id, limit))
         
         return cur.fetchall()
     except Exception as e:
-        logger.error(f"Error retrieving chat history: {e}")
+        logger.error(f"Error retrieving chat sessions: {e}")
         return []
     finally:
         try:
@@ -1517,30 +2325,21 @@ def get_chat_history(user_id, session_id=None, limit=50):
         except:
             pass
 
-def get_user_chat_sessions(user_id, limit=20):
-    """Get list of chat sessions for a user"""
+def chat_session_exists(user_id, session_id):
+    """True if the user has a chat session with this id (a primary key lookup)"""
+    flush_chat_writes(user_id, session_id)
     conn = get_db_connection()
     if not conn:
-        return []
+        return False
     
     try:
-        cur = conn.cursor(dictionary=True)
-        cur.execute("""
-            SELECT session_id, 
-                   MAX(timestamp) as last_message,
-                   COUNT(*) as message_count,
-                   SUBSTRING(MIN(CASE WHEN message_type = 'user' THEN message_content END), 1, 50) as first_user_message
-            FROM chat_history 
-            WHERE user_id = %s
-            GROUP BY session_id
-            ORDER BY MAX(timestamp) DESC
-            LIMIT %s
-        """, (user_id, limit))
-        
-        return cur.fetchall()
+        cur = conn.cursor()
+        cur.execute("SELECT 1 FROM chat_sessions WHERE user_id = %s AND session_id = %s",
+                    (user_id, session_id))
+        return cur.fetchone() is not None
     except Exception as e:
-        logger.error(f"Error retrieving chat sessions: {e}")
-        return []
+        logger.error(f"Error checking chat session: {e}")
+        return False
     finally:
         try:
             cur.close()
@@ -1548,27 +2347,66 @@ def get_user_chat_sessions(user_id, limit=20):
         except:
             pass
 
+def backfill_chat_sessions(cur, user_id=None):
+    """
+    Rebuilds chat_sessions from chat_history, for every user or just user_id. The caller
+    starts the transaction and commits (connections are autocommit by default). Run it
+    with chat writes paused: messages written during the rebuild could be counted twice.
+
+    Returns:
+        int: Number of sessions written.
+    """
+    if user_id is None:
+        cur.execute("DELETE FROM chat_sessions")
+        scope, params = "", ()
+    else:
+        cur.execute("DELETE FROM chat_sessions WHERE user_id = %s", (user_id,))
+        scope, params = "WHERE h.user_id = %s", (user_id,)
+    cur.execute(f"""
+        INSERT INTO chat_sessions (user_id, session_id, last_message, message_count, title)
+        SELECT h.user_id, h.session_id, MAX(h.timestamp), COUNT(*),
+               (SELECT SUBSTRING(f.message_content, 1, 50)
+                FROM chat_history f
+                WHERE f.user_id = h.user_id AND f.session_id = h.session_id AND f.message_type = 'user'
+                ORDER BY f.timestamp, f.id
+                LIMIT 1)
+        FROM chat_history h
+        {scope}
+        GROUP BY h.user_id, h.session_id
+    """, params)
+    return cur.rowcount
+
 # ============================================================
 # CHATBOT API
 # ============================================================
 FAISS_PATH = "data/embeddings/faiss_index.bin"
 DATA_PATH = "data/processed_data.csv"
+CATALOGUE_PATH = catalogue_path_for(DATA_PATH)
 
 # Initialize RAG pipeline after environment is loaded
 rag_pipeline = None
 
+# Filled in as the process starts; shown on /api/system/status
+startup_info = {
+    'mode': 'lazy',
+    'started_at': time.time(),
+    'import_seconds': None,
+    'rag_init_seconds': None,
+    'preloaded_in_pid': None
+}
+
 def initialize_rag_pipeline():
     """Initialize RAG pipeline with proper environment setup"""
     global rag_pipeline
     if rag_pipeline is None:
         try:
-            # Ensure Groq API key is available
-            groq_key = env('GROQ_API_KEY')
-            if not groq_key:
-                logger.error("❌ GROQ_API_KEY not found in environment")
-                raise Exception("GROQ_API_KEY environment variable not set")
+            if DISABLE_RAG:
+                raise Exception("RAG pipeline disabled by DISABLE_RAG")
+            # Retrieval is local; without a key only Groq generation is unavailable
+            if not env('GROQ_API_KEY'):
+                logger.warning("⚠️ GROQ_API_KEY not found in environment; loading RAG pipeline for retrieval only")
             
-            logger.info(f"✅ Initializing RAG pipeline with Groq key: {groq_key[:20]}...")
+            logger.info("✅ Initializing RAG pipeline...")
             logger.info(f"📊 RAG Data paths: FAISS={FAISS_PATH}, CSV={DATA_PATH}")
             
             # Check if data files exist
@@ -1577,91 +2415,294 @@ def initialize_rag_pipeline():
             if not os.path.exists(DATA_PATH):
                 logger.warning(f"⚠️ CSV data not found at {DATA_PATH}")
             
+            started = time.perf_counter()
+            from src.pipeline import RAGPipeline
             rag_pipeline = RAGPipeline(faiss_path=FAISS_PATH, data_path=DATA_PATH)
-            logger.info("✅ RAG pipeline initialized successfully")
-            
-            # Test RAG pipeline with a simple query
-            try:
-                test_result = rag_pipeline.run("paracetamol", context=None)
-                logger.info(f"🧪 RAG Test Query Result: {test_result[:100]}...")
-            except Exception as test_e:
-                logger.error(f"⚠️ RAG test query failed: {test_e}")
-                
+            semantic_cache.encoder = rag_pipeline.embedder.query_encoder
+            startup_info['rag_init_seconds'] = round(time.perf_counter() - started, 3)
+            logger.info(f"✅ RAG pipeline initialized successfully in {startup_info['rag_init_seconds']}s")
         except Exception as e:
             logger.error(f"❌ Failed to initialize RAG pipeline: {e}")
             raise e
     return rag_pipeline
 
+# ============================================================
+# WARMUP AND READINESS
+# ============================================================
+WARMUP_QUERY = env('WARMUP_QUERY', 'paracetamol tablet')
+WARMUP_RETRY_SECONDS = float(env('WARMUP_RETRY_SECONDS', 30))
+
+class WarmupState:
+    """
+    Progress of the staged RAG warmup in this worker, per component.
+
+    Every stage is local (model, index, catalogue); none calls an LLM or needs an API key.
+    RAG is ready once all stages have passed, i.e. the vector store has served a search.
+    """
+    STAGES = ('pipeline', 'encoder', 'vector_store', 'catalogue')
+
+    def __init__(self):
+        self.lock = Lock()
+        self.thread = None
+        self.attempts = 0
+        self.started_at = None
+        self.finished_at = None
+        self.components = {name: {'ready': False, 'seconds': None, 'error': None} for name in self.STAGES}
+
+    def run_stage(self, name, fn):
+        started = time.perf_counter()
+        try:
+            result = fn()
+        except Exception as e:
+            with self.lock:
+                self.components[name].update(ready=False, seconds=round(time.perf_counter() - started, 3), error=str(e))
+            raise
+        with self.lock:
+            self.components[name].update(ready=True, seconds=round(time.perf_counter() - started, 3), error=None)
+        return result
+
+    @property
+    def ready(self):
+        with self.lock:
+            return all(c['ready'] for c in self.components.values())
+
+    def start(self, target):
+        """
+        Runs target in a background thread, unless a warmup is already running, has
+        succeeded, or failed less than WARMUP_RETRY_SECONDS ago.
+
+        Returns:
+            bool: True if a warmup was started.
+        """
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return False
+            if self.finished_at is not None:
+                failed = any(c['error'] for c in self.components.values())
+                if not failed or time.time() - self.finished_at < WARMUP_RETRY_SECONDS:
+                    return False
+            self.attempts += 1
+            self.started_at = time.time()
+            self.finished_at = None
+            self.thread = Thread(target=target, name='rag-warmup', daemon=True)
+            self.thread.start()
+            return True
+
+    def finish(self):
+        with self.lock:
+            self.finished_at = time.time()
+
+    def snapshot(self):
+        with self.lock:
+            running = self.thread is not None and self.thread.is_alive()
+            total = None
+            if self.started_at is not None and self.finished_at is not None:
+                total = round(self.finished_at - self.started_at, 3)
+            return {
+                'ready': all(c['ready'] for c in self.components.values()),
+                'running': running,
+                'attempts': self.attempts,
+                'started_at': self.started_at,
+                'warmup_seconds': total,
+                'components': {name: dict(c) for name, c in self.components.items()}
+            }
+
+warmup = WarmupState()
+
+def warm_up_rag_pipeline():
+    """
+    Loads the RAG pipeline if needed and exercises each part of it once: the query
+    encoder, a vector store search and a catalogue lookup. Spends no LLM quota.
+    """
+    try:
+        pipeline = warmup.run_stage(
+            'pipeline', lambda: rag_pipeline if rag_pipeline is not None else initialize_rag_pipeline()
+        )
+        warmup.run_stage('encoder', lambda: pipeline.embedder.query_encoder.encode(WARMUP_QUERY))
+        # The query vector is cached by now, so this times the search and row lookup. A flat
+        # index is scanned end to end, which pages in the whole memory-mapped index.
+        warmup.run_stage('vector_store', lambda: pipeline.embedder.retrieve(WARMUP_QUERY))
+        # Name matching, catalogue filtering and salt lookup, stopping short of generation
+        warmup.run_stage('catalogue', lambda: pipeline.retrieve(WARMUP_QUERY))
+        logger.info(f"🔥 RAG warmup finished: {warmup.snapshot()['components']}")
+    except Exception as e:
+        logger.warning(f"⚠️ RAG warmup failed: {e}")
+    finally:
+        warmup.finish()
+
+def start_warmup():
+    if DISABLE_RAG:
+        return False
+    return warmup.start(warm_up_rag_pipeline)
+
+@app.route('/healthz', methods=['GET'])
+def liveness():
+    """Liveness: the worker is up and serving requests. Never touches the DB or the models."""
+    return jsonify({'status': 'alive', 'pid': os.getpid(), 'uptime_seconds': round(time.time() - startup_info['started_at'], 1)})
+
+@app.route('/readyz', methods=['GET'])
+def readiness():
+    """
+    Readiness: 503 only while this worker's first RAG warmup is in progress. After that it
+    is 200, with status 'ready' if every stage passed, or 'degraded' if RAG is disabled or
+    failed to load; chat then answers through the LLM providers and canned fallbacks, as
+    it would without the vector store. A degraded worker retries the warmup every
+    WARMUP_RETRY_SECONDS without going back to 503.
+    """
+    if not warmup.ready:
+        start_warmup()
+    state = warmup.snapshot()
+    if state['ready']:
+        status = 'ready'
+    elif DISABLE_RAG:
+        status, state['reason'] = 'degraded', 'RAG disabled by DISABLE_RAG'
+    elif state['attempts'] == 0 or (state['attempts'] == 1 and state['running']):
+        status = 'warming'
+    else:
+        status = 'degraded'
+        state['reason'] = next((f"{name}: {c['error']}" for name, c in state['components'].items() if c['error']),
+                               'RAG warmup failed')
+    state.update(status=status, pid=os.getpid())
+    return jsonify(state), 503 if status == 'warming' else 200
+
+def cache_chat_answer(query, answer, cache_scope, model):
+    """Stores a generated answer in the exact and semantic caches under the model that wrote it"""
+    response_cache.set(query, answer, model=model, **cache_scope)
+    try:
+        semantic_cache.set(query, answer, scope=response_cache.get_cache_key('', model=model, **cache_scope))
+    except Exception as e:
+        logger.warning(f"Semantic cache store failed: {e}")
+
+def cached_chat_answer(query, cache_scope, models):
+    """
+    Looks the query up in the exact cache, then the semantic cache, under each model that
+    could answer it. Returns the cached answer or None.
+    """
+    for model in models:
+        cached_response = response_cache.get(query, model=model, **cache_scope)
+        if cached_response:
+            logger.info("Returning cached response")
+            return cached_response
+    # Then a paraphrase of an already answered question in the same scope
+    for model in models:
+        try:
+            semantic_hit = semantic_cache.get(query, scope=response_cache.get_cache_key('', model=model, **cache_scope))
+        except Exception as e:
+            logger.warning(f"Semantic cache lookup failed: {e}")
+            return None
+        if semantic_hit:
+            cached_response, similarity = semantic_hit
+            logger.info(f"Returning semantically cached response (similarity {similarity:.3f})")
+            return cached_response
+    return None
+
+def prepare_chat_turn(data):
+    """
+    Shared front half of /api/chat and /api/chat/stream: resolves the session and user message,
+    applies medicine/pronoun context, persists the user message and answers commands and
+    cache hits directly.
+
+    Returns None if there is no user message, otherwise a dict with session_id, user_message,
+    and either 'reply' (an already persisted answer) or cid / cache_scope for generating one.
+    """
+    messages = data.get('messages', [])
+    session_id = data.get('session_id')
+    
+    # Use provided session_id or current session
+    if not session_id:
+        session_id = session.get('current_chat_session')
+        if not session_id:
+            session_id = f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{session['user_id']}"
+            session['current_chat_session'] = session_id
+    
+    user_message = ""
+    for msg in reversed(messages):
+        if msg.get('role') == 'user':
+            user_message = msg.get('content', '').strip()
+            break
+    if not user_message:
+        return None
+
+    # Track last mentioned medicine in context
+    medicine_names = extract_medicine_names_from_text(user_message)
+    if medicine_names:
+        set_last_medicine_in_context(session_id, medicine_names[-1])
+        logger.info(f"Medicine context updated: {medicine_names[-1]} for session {session_id}")
+
+    # If user uses pronouns and no medicine detected, use last context
+    pronouns = ['it', 'this', 'that', 'them', 'these', 'those']
+    has_pronouns = any(p in user_message.lower() for p in pronouns)
+    
+    if has_pronouns and not medicine_names:
+        last_medicine = get_last_medicine_from_context(session_id)
+        if last_medicine:
+            # Replace pronoun with last medicine in user_message for processing
+            pronoun_pattern = r'\b(?:' + '|'.join(pronouns) + r')\b'
+            user_message = re.sub(pronoun_pattern, last_medicine, user_message, flags=re.IGNORECASE)
+            logger.info(f"Replaced pronouns with context medicine: {last_medicine}")
+
+    # Save user message to database
+    save_chat_message(session['user_id'], session_id, 'user', user_message)
+    turn = {'session_id': session_id, 'user_message': user_message, 'reply': None}
+    
+    # Handle context clearing command
+    if user_message.lower() in ['clear pdf', 'detach pdf', 'remove pdf', 'clear attachment']:
+        clear_pdf_context(session_id)
+        reply = "📄 PDF context cleared. You can attach another report."
+        save_chat_message(session['user_id'], session_id, 'ai', reply)
+        turn['reply'] = reply
+        return turn
+
+    # Check for CID in message (PDF processing)
+    cid = extract_cid_from_message(user_message)
+    logger.info(f"Extracted CID: {cid} from message: {user_message}")
+
+    # Cached answers are scoped to the PDF in play, the prompt variant and the model that
+    # wrote them. PDF questions always go to the Groq pipeline; plain chat can be answered
+    # by any provider, so it is looked up under each one in preference order.
+    attached_pdf = chat_pdf_contexts.get(session_id)
+    if cid:
+        cache_scope = {'context': cid, 'variant': 'pdf_cid'}
+        models = [GROQ_MODEL]
+    elif attached_pdf and attached_pdf['text']:
+        cache_scope = {'context': attached_pdf['text'], 'variant': 'pdf_context'}
+        models = [GROQ_MODEL]
+    else:
+        cache_scope = {'context': None, 'variant': 'chat'}
+        models = [PROVIDER_MODELS[p['name']] for p in api_manager.providers if p['name'] in PROVIDER_MODELS]
+    turn.update(cid=cid, cache_scope=cache_scope)
+
+    # Check cache first for any query
+    cached_response = cached_chat_answer(user_message, cache_scope, models)
+    if cached_response:
+        # Save cached AI response
+        save_chat_message(session['user_id'], session_id, 'ai', cached_response, cid)
+        turn['reply'] = cached_response
+    return turn
+
 @app.route('/api/chat', methods=['POST'])
 @login_required
 def api_chat():
     try:
         data = request.get_json()
-        messages = data.get('messages', [])
-        session_id = data.get('session_id')
-        
-        # Use provided session_id or current session
-        if not session_id:
-            session_id = session.get('current_chat_session')
-            if not session_id:
-                session_id = f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{session['user_id']}"
-                session['current_chat_session'] = session_id
-        
-        user_message = ""
-        for msg in reversed(messages):
-            if msg.get('role') == 'user':
-                user_message = msg.get('content', '').strip()
-                break
-        if not user_message:
+        turn = prepare_chat_turn(data)
+        if turn is None:
             return jsonify({'status': 'error', 'content': 'No user message received.'}), 400
-
-        # Track last mentioned medicine in context
-        medicine_names = extract_medicine_names_from_text(user_message)
-        if medicine_names:
-            set_last_medicine_in_context(session_id, medicine_names[-1])
-            logger.info(f"Medicine context updated: {medicine_names[-1]} for session {session_id}")
-
-        # If user uses pronouns and no medicine detected, use last context
-        pronouns = ['it', 'this', 'that', 'them', 'these', 'those']
-        has_pronouns = any(p in user_message.lower() for p in pronouns)
-        
-        if has_pronouns and not medicine_names:
-            last_medicine = get_last_medicine_from_context(session_id)
-            if last_medicine:
-                # Replace pronoun with last medicine in user_message for processing
-                pronoun_pattern = r'\b(?:' + '|'.join(pronouns) + r')\b'
-                user_message = re.sub(pronoun_pattern, last_medicine, user_message, flags=re.IGNORECASE)
-                logger.info(f"Replaced pronouns with context medicine: {last_medicine}")
-
-        # Save user message to database
-        save_chat_message(session['user_id'], session_id, 'user', user_message)
-        
-        # Check cache first for any query
-        cached_response = response_cache.get(user_message)
-        if cached_response:
-            logger.info("Returning cached response")
-            # Save cached AI response
-            save_chat_message(session['user_id'], session_id, 'ai', cached_response)
-            return jsonify({'status': 'success', 'content': cached_response, 'session_id': session_id})
-        
-        # Handle context clearing command
-        if user_message.lower() in ['clear pdf', 'detach pdf', 'remove pdf', 'clear attachment']:
-            clear_pdf_context(session_id)
-            reply = "📄 PDF context cleared. You can attach another report."
-            save_chat_message(session['user_id'], session_id, 'ai', reply)
-            return jsonify({'status': 'success', 'content': reply, 'session_id': session_id})
-
-        # Check for CID in message (PDF processing)
-        cid = extract_cid_from_message(user_message)
-        logger.info(f"Extracted CID: {cid} from message: {user_message}")
+        session_id = turn['session_id']
+        user_message = turn['user_message']
+        if turn['reply'] is not None:
+            return jsonify({'status': 'success', 'content': turn['reply'], 'session_id': session_id})
+        cid = turn['cid']
+        cache_scope = turn['cache_scope']
 
         # If no explicit CID but we have an attached PDF context, answer using it
         if not cid and session_id in chat_pdf_contexts and chat_pdf_contexts[session_id]['text']:
             try:
                 pipeline = rag_pipeline if rag_pipeline is not None else initialize_rag_pipeline()
-                pdf_text = chat_pdf_contexts[session_id]['text']
-                answer = pipeline.run(user_message, context=f"Attached PDF Content:\n{pdf_text}")
-                response_cache.set(user_message, answer)
+                pdf_context = session_pdf_context(session_id, user_message)
+                answer = pipeline.run(user_message, context=f"Attached PDF Content:\n{pdf_context}")
+                if pipeline.GENERATION_ERROR not in answer:
+                    cache_chat_answer(user_message, answer, cache_scope, GROQ_MODEL)
                 save_chat_message(session['user_id'], session_id, 'ai', answer,
                                   chat_pdf_contexts[session_id]['cid'])
                 return jsonify({'status': 'success', 'content': answer, 'session_id': session_id})
@@ -1675,10 +2716,8 @@ def api_chat():
                 # Use existing RAG pipeline or initialize if needed
                 pipeline = rag_pipeline if rag_pipeline is not None else initialize_rag_pipeline()
                 
-                pdf_path = download_pdf_from_ipfs(cid)
-                pdf_text = extract_text_from_pdf(pdf_path)
+                pdf_text, page_offsets, pdf_key = load_pdf_text(cid=cid)
                 logger.info(f"PDF text for CID {cid}: {pdf_text[:200]}...")
-                os.remove(pdf_path)
                 question = re.sub(cid, '', user_message).strip()
                 if not question:
                     question = "Summarize this PDF and identify any medicines mentioned"
@@ -1686,14 +2725,16 @@ def api_chat():
                     return jsonify({'status': 'error', 'content': f"PDF found (CID: {cid}), but no text could be extracted. Please check the PDF format."})
                 
                 # Enhanced context combining PDF + medicine dataset
-                enhanced_context = f"PDF Document Content:\n{pdf_text}\n\nUser Question: {question}"
+                pdf_context, _ = pdf_prompt_context(question, pdf_text, pdf_key, page_offsets)
+                enhanced_context = f"PDF Document Content:\n{pdf_context}\n\nUser Question: {question}"
                 
                 # Use RAG with combined context (PDF + medicine dataset)
                 answer = pipeline.run(question, context=enhanced_context)
                 
                 # Cache and save the response
-                response_cache.set(user_message, answer)
                 ai_response = f"📄 PDF Analysis (CID: {cid}):\n\n{answer}"
+                if pipeline.GENERATION_ERROR not in answer:
+                    cache_chat_answer(user_message, ai_response, cache_scope, GROQ_MODEL)
                 save_chat_message(session['user_id'], session_id, 'ai', ai_response, cid)
                 
                 return jsonify({'status': 'success', 'content': ai_response, 'session_id': session_id})
@@ -1708,8 +2749,8 @@ def api_chat():
         try:
             # Attempt primary provider (should be Groq)
             answer, provider_used = call_with_fallback(user_message)
-            # Cache successful response
-            response_cache.set(user_message, answer)
+            # Cache successful response under the model that actually wrote it
+            cache_chat_answer(user_message, answer, cache_scope, PROVIDER_MODELS[provider_used])
             # Save AI response
             save_chat_message(session['user_id'], session_id, 'ai', answer)
             
@@ -1731,6 +2772,96 @@ def api_chat():
             save_chat_message(session['user_id'], session_id, 'ai', fallback_response)
         return jsonify({'status': 'success', 'content': fallback_response, 'session_id': session_id if 'session_id' in locals() else 'error'})
 
+def sse_event(event, payload):
+    """Formats one server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+@app.route('/api/chat/stream', methods=['POST'])
+@login_required
+def api_chat_stream():
+    """
+    Streaming sibling of /api/chat. Relays the answer as server-sent events:
+    'token' events carry text as it is generated, a final 'done' event carries the full
+    answer. The full answer is cached and persisted once the stream completes; if the
+    client disconnects first, the text already sent is still persisted.
+    """
+    data = request.get_json() or {}
+    turn = prepare_chat_turn(data)
+    if turn is None:
+        return jsonify({'status': 'error', 'content': 'No user message received.'}), 400
+    user_id = session['user_id']
+    session_id = turn['session_id']
+    user_message = turn['user_message']
+
+    def generate():
+        if turn['reply'] is not None:
+            yield sse_event('token', {'token': turn['reply']})
+            yield sse_event('done', {'status': 'success', 'content': turn['reply'], 'session_id': session_id})
+            return
+
+        cid = turn['cid']
+        attached_pdf = chat_pdf_contexts.get(session_id)
+        pdf_cid = cid
+        parts = []
+        cacheable = True
+        pipeline = None
+        model = GROQ_MODEL
+        answer = None
+        try:
+            if cid:
+                pipeline = rag_pipeline if rag_pipeline is not None else initialize_rag_pipeline()
+                pdf_text, page_offsets, pdf_key = load_pdf_text(cid=cid)
+                question = re.sub(cid, '', user_message).strip()
+                if not question:
+                    question = "Summarize this PDF and identify any medicines mentioned"
+                if not pdf_text.strip():
+                    tokens = iter([(None, f"PDF found (CID: {cid}), but no text could be extracted. Please check the PDF format.")])
+                    cacheable = False
+                else:
+                    pdf_context, _ = pdf_prompt_context(question, pdf_text, pdf_key, page_offsets)
+                    enhanced_context = f"PDF Document Content:\n{pdf_context}\n\nUser Question: {question}"
+                    prefix = f"📄 PDF Analysis (CID: {cid}):\n\n"
+                    parts.append(prefix)
+                    yield sse_event('token', {'token': prefix})
+                    tokens = ((GROQ_MODEL, token) for token in pipeline.run_stream(question, context=enhanced_context))
+            elif attached_pdf and attached_pdf['text']:
+                pipeline = rag_pipeline if rag_pipeline is not None else initialize_rag_pipeline()
+                pdf_cid = attached_pdf['cid']
+                pdf_context = session_pdf_context(session_id, user_message)
+                tokens = ((GROQ_MODEL, token) for token in
+                          pipeline.run_stream(user_message, context=f"Attached PDF Content:\n{pdf_context}"))
+            else:
+                tokens = ((PROVIDER_MODELS[name], token) for name, token in stream_with_fallback(user_message))
+
+            for model, token in tokens:
+                parts.append(token)
+                yield sse_event('token', {'token': token})
+            answer = ''.join(parts).strip()
+            # The pipeline reports a failed generation in-band; that text is not an answer
+            if cacheable and pipeline is not None and pipeline.GENERATION_ERROR in answer:
+                cacheable = False
+            if cacheable:
+                cache_chat_answer(user_message, answer, turn['cache_scope'], model)
+        except Exception as e:
+            logger.error(f"[CHAT STREAM] Error: {e}")
+            if not parts:
+                fallback = fallback_responder.get_response(user_message)
+                parts.append(fallback)
+                yield sse_event('token', {'token': fallback})
+            # Keep what the user already saw; don't cache a truncated answer
+            answer = ''.join(parts).strip()
+        finally:
+            # A client that disconnects closes the generator at a yield with GeneratorExit,
+            # which skips the except above and the lines below; keep what it was sent
+            if answer is None and parts:
+                save_chat_message(user_id, session_id, 'ai', ''.join(parts).strip(), pdf_cid)
+
+        save_chat_message(user_id, session_id, 'ai', answer, pdf_cid)
+        yield sse_event('done', {'status': 'success', 'content': answer, 'session_id': session_id})
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/api/chat_pdf', methods=['POST'])
 @login_required
 def api_chat_pdf():
@@ -1744,10 +2875,9 @@ def api_chat_pdf():
         # Use existing RAG pipeline or initialize if needed
         pipeline = rag_pipeline if rag_pipeline is not None else initialize_rag_pipeline()
         
-        pdf_path = download_pdf_from_ipfs(cid)
-        pdf_text = extract_text_from_pdf(pdf_path)
-        os.remove(pdf_path)
-        answer = pipeline.run(question, context=pdf_text)
+        pdf_text, page_offsets, pdf_key = load_pdf_text(cid=cid)
+        pdf_context, _ = pdf_prompt_context(question, pdf_text, pdf_key, page_offsets)
+        answer = pipeline.run(question, context=pdf_context)
         return jsonify({'status': 'success', 'content': answer})
     except Exception as e:
         logger.error(f"Chat PDF error: {e}")
@@ -1786,8 +2916,7 @@ def switch_chat_session():
         return jsonify({'status': 'error', 'message': 'Session ID required'}), 400
     
     # Verify session belongs to user
-    user_sessions = get_user_chat_sessions(session['user_id'])
-    if not any(s['session_id'] == session_id for s in user_sessions):
+    if not chat_session_exists(session['user_id'], session_id):
         return jsonify({'status': 'error', 'message': 'Session not found'}), 404
     
     session['current_chat_session'] = session_id
@@ -1809,19 +2938,26 @@ def delete_chat_session():
     if not session_id:
         return jsonify({'status': 'error', 'message': 'Session ID required'}), 400
     
+    # Queued messages of this session must not land after the delete
+    flush_chat_writes(session['user_id'], session_id)
     conn = get_db_connection()
     if not conn:
         return jsonify({'status': 'error', 'message': 'Database connection failed'}), 500
     
     try:
+        # History and summary go together
+        conn.start_transaction()
         cur = conn.cursor()
         # Verify session belongs to user and delete
         cur.execute("DELETE FROM chat_history WHERE user_id = %s AND session_id = %s", 
                    (session['user_id'], session_id))
         
         if cur.rowcount == 0:
+            conn.rollback()
             return jsonify({'status': 'error', 'message': 'Session not found'}), 404
         
+        cur.execute("DELETE FROM chat_sessions WHERE user_id = %s AND session_id = %s",
+                   (session['user_id'], session_id))
         conn.commit()
         
         # If deleted session was current, create new one
@@ -1832,6 +2968,7 @@ def delete_chat_session():
         return jsonify({'status': 'success', 'message': 'Session deleted'})
     except Exception as e:
         logger.error(f"Error deleting chat session: {e}")
+        conn.rollback()
         return jsonify({'status': 'error', 'message': 'Failed to delete session'}), 500
     finally:
         try:
@@ -1844,17 +2981,22 @@ def delete_chat_session():
 @login_required
 def clear_chat_history():
     """Clear all chat history for the current user"""
+    flush_chat_writes(session['user_id'])
     conn = get_db_connection()
     if not conn:
         return jsonify({'status': 'error', 'message': 'Database connection failed'}), 500
     
     try:
+        # History and summary go together
+        conn.start_transaction()
         cur = conn.cursor()
         cur.execute("DELETE FROM chat_history WHERE user_id = %s", (session['user_id'],))
+        cur.execute("DELETE FROM chat_sessions WHERE user_id = %s", (session['user_id'],))
         conn.commit()
         return jsonify({'status': 'success', 'message': 'Chat history cleared'})
     except Exception as e:
         logger.error(f"Error clearing chat history: {e}")
+        conn.rollback()
         return jsonify({'status': 'error', 'message': 'Failed to clear history'}), 500
     finally:
         try:
@@ -1872,14 +3014,35 @@ def system_status():
         'csv_exists': os.path.exists(DATA_PATH),
         'faiss_path': FAISS_PATH,
         'csv_path': DATA_PATH,
-        'rag_initialized': rag_pipeline is not None
+        'rag_initialized': rag_pipeline is not None,
+        'response_cache': response_cache.stats(),
+        'semantic_cache': semantic_cache.stats(),
+        'providers': api_manager.status(),
+        'http': http_client.stats(),
+        'ipfs_cache': pdf_cache.stats(),
+        'pdf_text_cache': pdf_text_cache.stats(),
+        'pdf_prompts': pdf_prompt_stats.stats(),
+        'startup': dict(startup_info, pid=os.getpid(), memory=memory_usage()),
+        'warmup': warmup.snapshot(),
+        'chat_writes': chat_writer.stats()
     }
-    
-    # Try to read a few lines from CSV if it exists
-    if status['csv_exists']:
+
+    if rag_pipeline is not None:
+        status['query_encoder'] = rag_pipeline.embedder.query_encoder.stats()
+
+    status['catalogue_path'] = CATALOGUE_PATH
+    status['catalogue_current'] = is_catalogue_current(DATA_PATH, CATALOGUE_PATH)
+
+    # Describe the loaded catalogue; only touch disk when the pipeline isn't up yet
+    if rag_pipeline is not None or status['catalogue_current'] or status['csv_exists']:
         try:
-            import pandas as pd
-            df = pd.read_csv(DATA_PATH)
+            if rag_pipeline is not None:
+                df = rag_pipeline.df
+            elif status['catalogue_current']:
+                df = load_catalogue(CATALOGUE_PATH)
+            else:
+                import pandas as pd
+                df = pd.read_csv(DATA_PATH)
             status['csv_shape'] = df.shape
             status['csv_columns'] = list(df.columns)
             status['csv_sample'] = df.head(2).to_dict('records') if not df.empty else []
@@ -1903,51 +3066,155 @@ def extract_cid_from_message(message):
         return match.group(1)
     return None
 
+IPFS_GATEWAYS = [
+    "http://127.0.0.1:8080/ipfs/{cid}",           # Local IPFS
+    "https://ipfs.io/ipfs/{cid}",                 # Official gateway
+    "https://gateway.pinata.cloud/ipfs/{cid}",    # Pinata gateway
+    "https://cloudflare-ipfs.com/ipfs/{cid}",     # Cloudflare gateway
+    "https://dweb.link/ipfs/{cid}",               # Protocol Labs gateway
+]
+
+pdf_cache = PdfDiskCache(
+    directory=env('IPFS_CACHE_DIR', 'data/cache/ipfs'),
+    max_bytes=int(env('IPFS_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+)
+gateway_racer = GatewayRacer(
+    http_client,
+    pdf_cache,
+    [g.strip() for g in env('IPFS_GATEWAYS', ','.join(IPFS_GATEWAYS)).split(',') if g.strip()],
+    max_bytes=int(env('IPFS_MAX_PDF_BYTES', str(50 * 1024 * 1024))),
+    timeout=int(env('IPFS_DOWNLOAD_TIMEOUT', '30')),
+    logger=logger
+)
+
 def download_pdf_from_ipfs(cid):
-    """Download PDF from IPFS with multiple gateway fallbacks"""
-    gateways = [
-        f"http://127.0.0.1:8080/ipfs/{cid}",  # Local IPFS
-        f"https://ipfs.io/ipfs/{cid}",        # Official gateway
-        f"https://gateway.pinata.cloud/ipfs/{cid}",  # Pinata gateway
-        f"https://cloudflare-ipfs.com/ipfs/{cid}",   # Cloudflare gateway
-        f"https://dweb.link/ipfs/{cid}",      # Protocol Labs gateway
-    ]
+    """
+    Local path of the PDF for a CID. Served from the on-disk cache when possible, otherwise
+    raced across all gateways. The file belongs to the cache: callers must not delete it.
+    """
+    return gateway_racer.fetch(cid)
+
+pdf_text_cache = PdfTextCache(
+    path=env('PDF_TEXT_CACHE_PATH', 'data/cache/pdf_text.sqlite3'),
+    max_documents=int(env('PDF_TEXT_CACHE_SIZE', '500'))
+)
+
+# Budgets so one huge or scanned report can't pin a request thread
+PDF_EXTRACT_LIMITS = {
+    'max_pages': int(env('PDF_MAX_PAGES', '200')),
+    'max_chars': int(env('PDF_MAX_CHARS', '500000')),
+    'time_budget': float(env('PDF_EXTRACT_TIME_BUDGET', '30')),
+    'workers': int(env('PDF_EXTRACT_WORKERS', str(min(4, os.cpu_count() or 1))))
+}
+
+def load_pdf_text(pdf_path=None, cid=None):
+    """
+    Extracted text of a PDF, served from pdf_text_cache when this document (by CID, or by
+    SHA-256 for uploads) has been seen before. Given a cid and no pdf_path, the PDF is only
+    downloaded from IPFS on a cache miss.
     
-    for gateway_url in gateways:
-        try:
-            logger.info(f"Trying to download from: {gateway_url}")
-            response = requests.get(gateway_url, timeout=30)
-            response.raise_for_status()
-            
-            temp_path = f"temp_{cid}.pdf"
-            with open(temp_path, "wb") as f:
-                f.write(response.content)
-            
-            logger.info(f"✅ Successfully downloaded from {gateway_url}")
-            return temp_path
-            
-        except Exception as e:
-            logger.warning(f"❌ Failed to download from {gateway_url}: {e}")
-            continue
+    Returns:
+        tuple: (text, page_offsets, key) where page_offsets[i] is where page i starts in text.
+            key is None when extraction ran out of time, so nothing derived from this
+            partial text (such as chunk embeddings) gets cached under the document.
+    """
+    key = document_key(cid=cid, path=pdf_path)
+    cached = pdf_text_cache.get_text(key)
+    if cached is not None:
+        text, page_offsets = cached
+        logger.info(f"📄 PDF text cache hit for {key} ({len(text)} chars)")
+        return text, page_offsets, key
+    if pdf_path is None:
+        pdf_path = download_pdf_from_ipfs(cid)
     
-    raise Exception(f"Failed to download CID {cid} from all IPFS gateways")
-
-def extract_text_from_pdf(pdf_path):
-    text = ""
     try:
-        with open(pdf_path, "rb") as f:
-            reader = PyPDF2.PdfReader(f)
-            for page in reader.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text
-        if not text.strip():
-            logger.error(f"PDF extraction returned empty text for {pdf_path}")
-        else:
-            logger.info(f"Extracted PDF text length: {len(text)} from {pdf_path}")
+        result = extract_pdf(pdf_path, **PDF_EXTRACT_LIMITS)
     except Exception as e:
         logger.error(f"Error extracting PDF text: {e}")
-    return text
+        return "", [], key
+    text = result.text
+    if result.truncated:
+        logger.warning(f"⚠️ PDF extraction stopped at {result.truncated}: "
+                       f"{result.pages_read}/{result.pages_total} pages from {pdf_path}")
+    if not text.strip():
+        logger.error(f"PDF extraction returned empty text for {pdf_path}")
+    else:
+        logger.info(f"Extracted PDF text length: {len(text)} from {pdf_path}")
+    # A time-budget cut depends on load at the moment, so only cache deterministic results
+    if result.truncated == 'time_budget':
+        return text, result.page_offsets, None
+    pdf_text_cache.put_text(key, text, result.page_offsets)
+    return text, result.page_offsets, key
+
+def pdf_chunk_embeddings(key, text):
+    """
+    Chunk spans of a PDF's text and their embeddings, computed once per document and
+    embedding model and then served from pdf_text_cache. Without a key (partial text) they
+    are computed every time.
+    
+    Returns:
+        tuple: (spans, vectors) with spans as (start, end) offsets into text.
+    """
+    import numpy as np
+    pipeline = rag_pipeline if rag_pipeline is not None else initialize_rag_pipeline()
+    embedder = pipeline.embedder
+    cached = pdf_text_cache.get_chunks(key, embedder.embedding_model_name) if key else None
+    if cached is not None:
+        return cached
+    spans = chunk_text(text)
+    if spans:
+        vectors = embedder.embedding_model.encode([text[start:end] for start, end in spans])
+    else:
+        vectors = np.zeros((0, embedder.embedding_model.get_sentence_embedding_dimension()), dtype='float32')
+    vectors = np.asarray(vectors, dtype='float32')
+    if key:
+        pdf_text_cache.put_chunks(key, embedder.embedding_model_name, spans, vectors)
+    return spans, vectors
+
+# PDF context sent with a question: short documents go in whole, longer ones are chunked,
+# embedded and searched, so only the relevant excerpts reach the prompt
+PDF_CONTEXT_MAX_CHARS = int(env('PDF_CONTEXT_MAX_CHARS', '6000'))
+PDF_RETRIEVAL_TOP_K = int(env('PDF_RETRIEVAL_TOP_K', '5'))
+PDF_OVERVIEW_KEYWORDS = ["summarize", "summary", "overview", "key findings", "identify any medicines"]
+pdf_prompt_stats = PromptSizeStats()
+
+def pdf_prompt_context(question, text, key, page_offsets=None, chunk_index=None):
+    """
+    The part of a PDF to put in the prompt for question.
+    
+    Args:
+        question (str): The user's question.
+        text (str): Full extracted text of the PDF.
+        key (str): Document key, used to find cached chunk embeddings (None: don't cache).
+        page_offsets (list): Start offset of each page in text, for page labels.
+        chunk_index (PdfChunkIndex): A previously built index for this document, if any.
+    
+    Returns:
+        tuple: (context, chunk_index) so callers can keep the index for follow-ups.
+    """
+    start = time.time()
+    retrieved = len(text) > PDF_CONTEXT_MAX_CHARS
+    if not retrieved:
+        context = text
+    else:
+        if chunk_index is None:
+            spans, vectors = pdf_chunk_embeddings(key, text)
+            chunk_index = PdfChunkIndex(text, spans, vectors, page_offsets)
+        if any(kw in question.lower() for kw in PDF_OVERVIEW_KEYWORDS):
+            context = chunk_index.overview(PDF_CONTEXT_MAX_CHARS)
+        else:
+            pipeline = rag_pipeline if rag_pipeline is not None else initialize_rag_pipeline()
+            query_vector = pipeline.embedder.query_encoder.encode(question)
+            context = chunk_index.search(query_vector, PDF_RETRIEVAL_TOP_K, PDF_CONTEXT_MAX_CHARS)
+    pdf_prompt_stats.record(len(context), len(text), time.time() - start, retrieved)
+    return context, chunk_index
+
+def session_pdf_context(session_id, question):
+    """pdf_prompt_context for the PDF attached to a chat session, reusing its chunk index"""
+    ctx = chat_pdf_contexts[session_id]
+    context, ctx['index'] = pdf_prompt_context(question, ctx['text'], ctx.get('key'),
+                                               ctx.get('page_offsets'), ctx.get('index'))
+    return context
 
 # Add this global dictionary for session context tracking
 last_medicine_context = {}
@@ -2008,13 +3275,17 @@ def set_last_medicine_in_context(session_id, medicine):
     last_medicine_context[session_id] = medicine
 
 # Add after last_medicine_context
-chat_pdf_contexts = {}  # session_id -> { 'cid': str|None, 'filename': str|None, 'text': str }
+# session_id -> { 'cid', 'filename', 'text', 'key', 'page_offsets', 'index' (PdfChunkIndex, built on first question) }
+chat_pdf_contexts = {}
 
-def set_pdf_context(session_id, text, cid=None, filename=None):
+def set_pdf_context(session_id, text, cid=None, filename=None, key=None, page_offsets=None):
     chat_pdf_contexts[session_id] = {
         'cid': cid,
         'filename': filename,
-        'text': text
+        'text': text,
+        'key': key,
+        'page_offsets': page_offsets,
+        'index': None
     }
 
 def clear_pdf_context(session_id):
@@ -2027,19 +3298,14 @@ def attach_pdf_to_session(session_id, user_id, cid, filename):
     """
     try:
         pipeline = rag_pipeline if rag_pipeline is not None else initialize_rag_pipeline()
-        pdf_path = download_pdf_from_ipfs(cid)
-        pdf_text = extract_text_from_pdf(pdf_path)
-        try:
-            os.remove(pdf_path)
-        except:
-            pass
+        pdf_text, page_offsets, pdf_key = load_pdf_text(cid=cid)
         if not pdf_text.strip():
             msg = f"📄 Attached PDF (CID: {cid}) but no extractable text was found."
             save_chat_message(user_id, session_id, 'ai', msg, cid)
             return True, msg
-        set_pdf_context(session_id, pdf_text, cid=cid, filename=filename)
+        set_pdf_context(session_id, pdf_text, cid=cid, filename=filename, key=pdf_key, page_offsets=page_offsets)
         summary_prompt = f"Provide a concise medical summary of the attached PDF '{filename}'. Highlight medicines, key findings, and notable observations."
-        summary = pipeline.run(summary_prompt, context=pdf_text[:12000])
+        summary = pipeline.run(summary_prompt, context=session_pdf_context(session_id, summary_prompt))
         ai_msg = (f"📎 Attached PDF: {filename}\nCID: {cid}\n\nSummary:\n{summary}\n\n"
                   f"You can now ask follow-up questions (type 'clear pdf' to detach).")
         save_chat_message(user_id, session_id, 'ai', ai_msg, cid)
@@ -2087,7 +3353,7 @@ def upload_temp_pdf():
         import tempfile
         tmp = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
         f.save(tmp.name)
-        pdf_text = extract_text_from_pdf(tmp.name)
+        pdf_text, page_offsets, pdf_key = load_pdf_text(tmp.name)
         try:
             os.remove(tmp.name)
         except:
@@ -2095,9 +3361,9 @@ def upload_temp_pdf():
         if not pdf_text.strip():
             return jsonify({'status': 'error', 'message': 'No text extracted'}), 400
         pipeline = rag_pipeline if rag_pipeline is not None else initialize_rag_pipeline()
-        set_pdf_context(session_id, pdf_text, cid=None, filename=f.filename)
+        set_pdf_context(session_id, pdf_text, cid=None, filename=f.filename, key=pdf_key, page_offsets=page_offsets)
         summary_prompt = f"Summarize this uploaded medical PDF '{f.filename}'. List medicines if any."
-        summary = pipeline.run(summary_prompt, context=pdf_text[:12000])
+        summary = pipeline.run(summary_prompt, context=session_pdf_context(session_id, summary_prompt))
         ai_msg = (f"📎 Temporary PDF Attached (not on IPFS): {f.filename}\n\nSummary:\n{summary}\n\n"
                   f"Ask follow-up questions (type 'clear pdf' to detach).")
         save_chat_message(session['user_id'], session_id, 'ai', ai_msg, None)
@@ -2246,6 +3512,41 @@ def delete_emergency_contact(contact_id):
         except:
             pass
 
+# ============================================================
+# WORKER STARTUP (gunicorn, see gunicorn.conf.py)
+# ============================================================
+def preload_for_workers():
+    """
+    preload_app path, run once in the gunicorn master before workers are forked. The
+    embedding model, FAISS index and catalogue are loaded here, so every worker shares those
+    pages copy-on-write instead of loading its own copy.
+    """
+    started = time.perf_counter()
+    init_db()
+    # Workers open their own DB connections; none may be inherited from the master
+    close_db_pool()
+    try:
+        initialize_rag_pipeline()
+    except Exception as e:
+        logger.warning(f"⚠️ RAG pipeline preload failed: {e}; workers will load it on first use")
+    # Keep the cyclic GC in the workers from writing to (and so copying) every preloaded object
+    gc.freeze()
+    startup_info.update(mode='preload', preloaded_in_pid=os.getpid())
+    logger.info(f"📦 Preloaded for workers in {time.perf_counter() - started:.2f}s ({memory_usage()})")
+
+def init_worker():
+    """
+    Runs in every worker once it has booted. Without preload_app the worker also sets up
+    the DB and loads its own RAG pipeline. Either way the warmup runs in the background,
+    so /healthz answers straight away and /readyz turns 200 once it has finished.
+    """
+    if startup_info['mode'] != 'preload':
+        init_db()
+        startup_info['mode'] = 'per_worker'
+    start_warmup()
+
+startup_info['import_seconds'] = round(time.perf_counter() - _import_started, 3)
+
 # ============================================================
 # MAIN (APPLICATION STARTUP)
 # ============================================================
@@ -2270,13 +3571,13 @@ if __name__ == '__main__':
     else:
         logger.info("✅ All systems operational")
 
-    # Initialize RAG pipeline
-    try:
-        logger.info("🔄 Initializing RAG pipeline at startup...")
-        initialize_rag_pipeline()
+    # Load and warm the RAG pipeline (local only, no LLM calls)
+    logger.info("🔄 Warming up RAG pipeline at startup...")
+    if start_warmup():
+        warmup.thread.join()
+    if warmup.ready:
         logger.info("✅ RAG pipeline loaded and ready!")
-    except Exception as e:
-        logger.warning(f"⚠️ RAG pipeline initialization failed: {e}")
+    else:
         logger.info("📚 Application will use fallback responses for medical queries")
 
     logger.info(f"🌐 Starting Flask server on {host}:{port}")
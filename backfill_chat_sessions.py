@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Rebuilds the chat_sessions summary table from chat_history.
+
+init_db() does this by itself the first time chat_sessions is created. Run this script
+to repair the table, ideally while the app is stopped.
+
+Usage: python backfill_chat_sessions.py [user_id]
+"""
+import os
+import sys
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import init_db, get_db_connection, backfill_chat_sessions
+
+if __name__ == "__main__":
+    user_id = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    init_db()
+    conn = get_db_connection()
+    if not conn:
+        print("❌ No database connection")
+        sys.exit(1)
+    try:
+        conn.start_transaction()
+        cur = conn.cursor()
+        sessions = backfill_chat_sessions(cur, user_id)
+        conn.commit()
+        print(f"✅ Rebuilt {sessions} chat sessions" + (f" for user {user_id}" if user_id is not None else ""))
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Backfill failed: {e}")
+        sys.exit(1)
+    finally:
+        conn.close()
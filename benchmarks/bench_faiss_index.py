@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Recall/latency report for the FAISS index types supported by Embedder.
+
+Usage: python benchmarks/bench_faiss_index.py [processed_csv] [top_k]
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.data_processor import DataProcessor
+from src.embedder import Embedder, INDEX_TYPES
+
+QUERIES = [
+    "what is paracetamol",
+    "medicine for fever and headache",
+    "antibiotic for throat infection",
+    "tablet for high blood pressure",
+    "side effects of metformin",
+    "cheap painkiller",
+    "acid reflux treatment",
+    "allergy tablet cetirizine",
+]
+
+if __name__ == "__main__":
+    data_path = sys.argv[1] if len(sys.argv) > 1 else "data/processed_data.csv"
+    top_k = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    processor = DataProcessor(data_path=data_path, save_path=data_path)
+    processor.preprocess()
+    df = processor.df
+
+    print(f"{'index':<8} {'recall@' + str(top_k):>10} {'flat ms':>10} {'index ms':>10} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for index_type in INDEX_TYPES:
+            path = os.path.join(tmp, f"{index_type}.bin")
+            embedder = Embedder(index_type=index_type)
+            embedder.create_vector_store(df, path)
+            embedder.load_vector_store(path, df)
+            r = embedder.evaluate_index(QUERIES, top_k=top_k)
+            print(f"{index_type:<8} {r['recall_at_k']:>10.3f} {r['flat_latency_ms']:>10.3f} "
+                  f"{r['index_latency_ms']:>10.3f} {r['speedup']:>8.2f}")
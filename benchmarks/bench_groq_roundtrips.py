@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Latency and token usage of a medicine question, before and after the retrieval-only path.
+
+before: RAGPipeline.run() generates an answer, which is then fed into a second completion
+        (what call_groq_api used to do).
+after:  RAGPipeline.retrieve() builds the context without generating; one completion.
+
+Needs GROQ_API_KEY. Usage: python benchmarks/bench_groq_roundtrips.py [faiss_path] [data_path]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.pipeline import RAGPipeline
+
+QUERIES = [
+    "what is paracetamol",
+    "tell me about azithromycin",
+    "what is metformin tablet used for",
+    "tell me about cetirizine",
+    "what is pantoprazole",
+]
+
+ANSWER_PROMPT = """You are a friendly medical assistant. Based on the following medical database information, provide a brief, conversational response about: {query}
+
+Medical Database Information:
+{context}
+
+Give a concise answer in 2-3 sentences maximum."""
+
+
+def complete(pipeline, prompt, max_tokens):
+    result = pipeline.client.chat.completions.create(
+        model=pipeline.model_name,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.7,
+        max_tokens=max_tokens,
+        top_p=0.9
+    )
+    return result.choices[0].message.content.strip(), result.usage.total_tokens
+
+
+def before(pipeline, query):
+    answer, prompt = pipeline._prepare(query)
+    tokens = calls = 0
+    if prompt is not None:
+        answer, used = complete(pipeline, prompt, 500)
+        tokens, calls = tokens + used, calls + 1
+    _, used = complete(pipeline, ANSWER_PROMPT.format(query=query, context=answer), 200)
+    return tokens + used, calls + 1
+
+
+def after(pipeline, query):
+    retrieval = pipeline.retrieve(query)
+    context = retrieval['answer'] or retrieval['context']
+    _, used = complete(pipeline, ANSWER_PROMPT.format(query=query, context=context), 200)
+    return used, 1
+
+
+if __name__ == "__main__":
+    faiss_path = sys.argv[1] if len(sys.argv) > 1 else "data/embeddings/faiss_index.bin"
+    data_path = sys.argv[2] if len(sys.argv) > 2 else "data/processed_data.csv"
+    pipeline = RAGPipeline(faiss_path=faiss_path, data_path=data_path)
+
+    print(f"{'query':<36} {'before s':>9} {'tokens':>7} {'calls':>5} {'after s':>8} {'tokens':>7} {'calls':>5}")
+    totals = [0.0, 0, 0.0, 0]
+    for query in QUERIES:
+        start = time.perf_counter()
+        before_tokens, before_calls = before(pipeline, query)
+        before_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        after_tokens, after_calls = after(pipeline, query)
+        after_s = time.perf_counter() - start
+
+        totals = [totals[0] + before_s, totals[1] + before_tokens, totals[2] + after_s, totals[3] + after_tokens]
+        print(f"{query[:36]:<36} {before_s:>9.2f} {before_tokens:>7} {before_calls:>5} "
+              f"{after_s:>8.2f} {after_tokens:>7} {after_calls:>5}")
+
+    n = len(QUERIES)
+    print(f"{'mean':<36} {totals[0] / n:>9.2f} {totals[1] / n:>7.0f} {'':>5} {totals[2] / n:>8.2f} {totals[3] / n:>7.0f}")
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+PDF text extraction time: the old serial `text += page` loop vs src.pdf_extractor, serial
+and with the page-parallel process pool.
+
+Usage: python benchmarks/bench_pdf_extract.py [pdf paths...]   (defaults to uploads/*.pdf)
+"""
+import glob
+import os
+import sys
+import time
+
+import PyPDF2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.pdf_extractor import extract_pdf
+
+
+def concat_extract(pdf_path):
+    text = ""
+    with open(pdf_path, "rb") as f:
+        reader = PyPDF2.PdfReader(f)
+        for page in reader.pages:
+            page_text = page.extract_text()
+            if page_text:
+                text += page_text
+    return text
+
+
+def timed(fn, repeat=3):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+if __name__ == "__main__":
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    paths = sys.argv[1:] or sorted(glob.glob(os.path.join(root, 'uploads', '*.pdf')))
+    workers = os.cpu_count() or 1
+
+    # Warm the pool so process start-up isn't charged to the first file
+    if paths:
+        extract_pdf(paths[0], workers=workers, parallel_threshold=1)
+
+    print(f"{'file':<28} {'pages':>5} {'concat s':>9} {'serial s':>9} {'pool s':>9} {'speedup':>8}")
+    for path in paths:
+        concat_s, expected = timed(lambda: concat_extract(path))
+        serial_s, serial = timed(lambda: extract_pdf(path, workers=1))
+        pool_s, pooled = timed(lambda: extract_pdf(path, workers=workers, parallel_threshold=1, batch_size=1))
+
+        assert serial.text == expected and pooled.text == expected, f"extracted text differs for {path}"
+        name = os.path.basename(path)[:28]
+        print(f"{name:<28} {serial.pages_total:>5} {concat_s:>9.3f} {serial_s:>9.3f} {pool_s:>9.3f} "
+              f"{concat_s / pool_s:>7.1f}x")
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Preprocessing time against row count: row-wise DataFrame.apply vs the vectorized path
+used by DataProcessor.preprocess.
+
+Usage: python benchmarks/bench_preprocess.py [row counts...]
+"""
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.data_processor import DataProcessor
+
+
+def synthetic_catalogue(rows):
+    return pd.DataFrame({
+        'Generic Name': [f"Generic {i}" for i in range(rows)],
+        'Brand Name': [f"Brand {i}" for i in range(rows)],
+        'Salt': [f"Salt {i % 500} (500mg)" for i in range(rows)],
+        'Manufacturer': [f"Maker {i % 80}" for i in range(rows)],
+        'Uses': ["Fever, pain relief" if i % 3 else None for i in range(rows)],
+        'Side Effects': ["Nausea, dizziness" for _ in range(rows)],
+        'Price': [f"₹{(i % 300) + 0.5}" for i in range(rows)],
+    })
+
+
+def apply_text(df):
+    df = df.fillna('')
+    return df.apply(lambda row:
+        f"Generic Name: {row['Generic Name']}. "
+        f"Brand Name: {row['Brand Name']}. "
+        f"Composition (Salt): {row['Salt']}. "
+        f"Manufacturer: {row['Manufacturer']}. "
+        f"Uses: {row['Uses']}. "
+        f"Side Effects: {row['Side Effects']}. "
+        f"Price: {row['Price']}.", axis=1
+    )
+
+
+def vectorized_text(df):
+    processor = DataProcessor(data_path=None, save_path=None)
+    processor.df = df
+    processor.preprocess()
+    return processor.df['text']
+
+
+if __name__ == "__main__":
+    sizes = [int(n) for n in sys.argv[1:]] or [1000, 10000, 50000, 100000]
+
+    print(f"{'rows':>8} {'apply s':>10} {'vectorized s':>13} {'speedup':>8}")
+    for rows in sizes:
+        df = synthetic_catalogue(rows)
+
+        start = time.perf_counter()
+        expected = apply_text(df.copy())
+        apply_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        actual = vectorized_text(df.copy())
+        vec_s = time.perf_counter() - start
+
+        assert expected.tolist() == actual.tolist(), "vectorized text differs from row-wise output"
+        print(f"{rows:>8} {apply_s:>10.3f} {vec_s:>13.3f} {apply_s / vec_s:>8.1f}x")
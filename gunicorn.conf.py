@@ -0,0 +1,32 @@
+"""
+gunicorn settings: gunicorn -c gunicorn.conf.py app:app
+
+With GUNICORN_PRELOAD=true (the default) the app, embedding model, FAISS index and
+catalogue are loaded once in the master and shared copy-on-write by the forked workers.
+With GUNICORN_PRELOAD=false every worker imports the app and loads its own copy.
+"""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', '2'))
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+
+def when_ready(server):
+    if preload_app:
+        from app import preload_for_workers
+        preload_for_workers()
+
+
+def post_worker_init(worker):
+    # Starts the background warmup; /readyz reports 503 until it has finished
+    from app import init_worker
+    init_worker()
+
+
+def worker_exit(server, worker):
+    # Write out chat messages still queued in this worker
+    from app import chat_writer
+    chat_writer.close()
@@ -0,0 +1,190 @@
+from abc import ABC, abstractmethod
+import os
+import sqlite3
+import threading
+import time
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+class SQLiteConnections:
+    """
+    Per-thread connections to the SQLite file at self.path, in WAL mode so readers never
+    block the writer. Connections must not cross a fork (gunicorn preload, process pools),
+    so they are closed before one and forgotten in the child.
+    """
+    def _open_connections(self, path):
+        self.path = path
+        self._local = threading.local()
+        os.register_at_fork(before=self.close, after_in_child=self._forget_connections)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        """Closes this thread's connection; the next call opens a new one"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _forget_connections(self):
+        self._local = threading.local()
+
+
+class CacheBackend(ABC):
+    """
+    Shared storage interface used by ResponseCache in place of its in-process LRU. Keys and
+    values are strings; ttl is in seconds (None or 0 means no expiry).
+    """
+    name = 'base'
+
+    @abstractmethod
+    def get(self, key):
+        pass
+
+    @abstractmethod
+    def set(self, key, value, ttl=None):
+        pass
+
+    @abstractmethod
+    def delete(self, key):
+        pass
+
+    @abstractmethod
+    def clear(self):
+        pass
+
+    def stats(self):
+        return {'backend': self.name}
+
+
+class SQLiteBackend(SQLiteConnections, CacheBackend):
+    """
+    Cache in a local SQLite file, shared by every worker process on the host.
+    Uses WAL mode so readers never block the writer; each thread gets its own connection.
+    """
+    name = 'sqlite'
+
+    def __init__(self, path, max_size=5000):
+        self.max_size = max_size
+        self.evictions = 0
+        self._open_connections(path)
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS response_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_response_cache_accessed ON response_cache (accessed_at)")
+
+    def get(self, key):
+        conn = self._conn()
+        now = time.time()
+        row = conn.execute("SELECT value, expires_at FROM response_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at is not None and expires_at <= now:
+            conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+            return None
+        conn.execute("UPDATE response_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return value
+
+    def set(self, key, value, ttl=None):
+        conn = self._conn()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO response_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, value, now + ttl if ttl else None, now)
+        )
+        overflow = conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0] - self.max_size
+        if overflow > 0:
+            conn.execute("""
+                DELETE FROM response_cache WHERE key IN (
+                    SELECT key FROM response_cache ORDER BY accessed_at ASC LIMIT ?
+                )
+            """, (overflow,))
+            self.evictions += overflow
+
+    def delete(self, key):
+        self._conn().execute("DELETE FROM response_cache WHERE key = ?", (key,))
+
+    def clear(self):
+        self._conn().execute("DELETE FROM response_cache")
+
+    def stats(self):
+        count = self._conn().execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+        return {
+            'backend': self.name,
+            'path': self.path,
+            'entries': count,
+            'max_entries': self.max_size,
+            'evictions': self.evictions
+        }
+
+
+class RedisBackend(CacheBackend):
+    """
+    Cache on a Redis-protocol server, shared across workers and hosts. Expiry is native;
+    size-based eviction is left to the server's maxmemory policy (e.g. allkeys-lru).
+    Any redis-py compatible client (such as a local stand-in) can be passed as `client`.
+    """
+    name = 'redis'
+
+    def __init__(self, url=None, client=None, prefix='medicare:response:'):
+        if client is None:
+            if redis is None:
+                raise ImportError("The 'redis' package is required for the Redis cache backend.")
+            client = redis.Redis.from_url(url or 'redis://localhost:6379/0', socket_timeout=2)
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        if value is None:
+            return None
+        return value.decode('utf-8') if isinstance(value, bytes) else value
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, value, ex=int(ttl) if ttl else None)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+    def stats(self):
+        return {'backend': self.name, 'prefix': self.prefix}
+
+
+def create_backend(kind='sqlite', **options):
+    """
+    Builds a shared cache backend by name.
+
+    Args:
+        kind (str): 'sqlite' or 'redis'.
+        **options: path / max_size (sqlite), url (redis).
+    """
+    if kind == 'sqlite':
+        return SQLiteBackend(options.get('path', 'data/cache/response_cache.sqlite3'),
+                             max_size=options.get('max_size', 5000))
+    if kind == 'redis':
+        return RedisBackend(url=options.get('url'))
+    raise ValueError(f"Unknown cache backend '{kind}'. Expected 'sqlite' or 'redis'.")
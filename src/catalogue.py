@@ -0,0 +1,100 @@
+import os
+
+
+def _feather():
+    # pyarrow is optional and slow to import, so it is only loaded when a catalogue is used
+    try:
+        import pyarrow.feather as feather
+    except ImportError:
+        return None
+    return feather
+
+
+def catalogue_path_for(data_path):
+    """Default location of the compiled catalogue next to the processed CSV."""
+    return os.path.splitext(data_path)[0] + '.arrow'
+
+
+def is_catalogue_current(data_path, catalogue_path):
+    """True if the compiled catalogue exists, can be read, and is not older than the CSV."""
+    if not os.path.exists(catalogue_path) or _feather() is None:
+        return False
+    if os.path.exists(data_path) and os.path.getmtime(catalogue_path) < os.path.getmtime(data_path):
+        return False
+    return True
+
+
+def compile_catalogue(data_path, catalogue_path=None):
+    """
+    Compiles a medicine CSV into an uncompressed Arrow IPC (Feather v2) file.
+
+    The file holds the processed columns (including 'text') plus a 'faiss_id' column
+    mapping each row to its id in the vector store, so startup never has to re-run
+    preprocessing or re-hash rows.
+
+    Args:
+        data_path (str): Raw or processed medicine CSV.
+        catalogue_path (str): Output path. Defaults to catalogue_path_for(data_path).
+
+    Returns:
+        str: The path the catalogue was written to.
+    """
+    feather = _feather()
+    if feather is None:
+        raise ImportError("pyarrow is required to compile the catalogue. Install it with 'pip install pyarrow'.")
+    from src.data_processor import DataProcessor
+    from src.embedder import row_id
+
+    catalogue_path = catalogue_path or catalogue_path_for(data_path)
+    processor = DataProcessor(data_path=data_path, save_path=data_path)
+    processor.load_data()
+    processor.preprocess(skip_if_current=True)
+    df = processor.df
+
+    # fillna('') leaves mixed str/float object columns, which Arrow cannot type
+    for column in df.columns:
+        if df[column].dtype == object:
+            df[column] = df[column].astype(str)
+    df['faiss_id'] = [row_id(t) for t in df['text']]
+
+    os.makedirs(os.path.dirname(catalogue_path) or '.', exist_ok=True)
+    # Write-then-rename so workers never map a half-written file
+    tmp_path = catalogue_path + '.tmp'
+    feather.write_feather(df, tmp_path, compression='uncompressed')
+    os.replace(tmp_path, catalogue_path)
+    print(f"Catalogue with {len(df)} rows written to {catalogue_path}")
+    return catalogue_path
+
+
+def load_catalogue(catalogue_path):
+    """
+    Loads a compiled catalogue through a read-only memory map.
+
+    String columns stay Arrow-backed (pd.ArrowDtype), so their data is read straight from
+    the mapped file and shared through the page cache instead of being copied into Python
+    objects in every process. Numeric columns are converted to regular numpy columns, so
+    NaN handling downstream is unchanged.
+    """
+    feather = _feather()
+    if feather is None:
+        raise ImportError("pyarrow is required to load the catalogue.")
+    import pandas as pd
+    import pyarrow as pa
+
+    def string_columns(arrow_type):
+        if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+            return pd.ArrowDtype(arrow_type)
+        return None
+
+    table = feather.read_table(catalogue_path, memory_map=True)
+    return table.to_pandas(types_mapper=string_columns)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compile the medicine CSV into a memory-mappable catalogue.")
+    parser.add_argument('data_path', help="Medicine CSV")
+    parser.add_argument('catalogue_path', nargs='?', default=None, help="Output .arrow file")
+    args = parser.parse_args()
+    compile_catalogue(args.data_path, args.catalogue_path)
@@ -1,12 +1,34 @@
+import hashlib
 import pandas as pd
 import os
 
+# Columns the 'text' column is built from
+SOURCE_COLUMNS = ['Generic Name', 'Brand Name', 'Salt', 'Manufacturer', 'Uses', 'Side Effects', 'Price']
+
+
+def parse_prices(prices):
+    """Parses price strings like '₹1,250.50' into floats; unparseable entries become NaN."""
+    cleaned = prices.astype(str).str.replace('₹', '', regex=False).str.replace(',', '', regex=False).str.strip()
+    return pd.to_numeric(cleaned, errors='coerce')
+
+
+def source_fingerprint(df):
+    """SHA-256 over the SOURCE_COLUMNS of df, so an edit to any of them is detected."""
+    hashes = pd.util.hash_pandas_object(df[SOURCE_COLUMNS].fillna('').astype(str), index=False)
+    return hashlib.sha256(hashes.values.tobytes()).hexdigest()
+
+
 class DataProcessor:
     def __init__(self, data_path, save_path):
         self.data_path = data_path
         self.save_path = save_path
         self.df = None
 
+    @property
+    def fingerprint_path(self):
+        """Sidecar next to save_path holding the source_fingerprint its 'text' was built from"""
+        return self.save_path + '.source.sha256'
+
     def load_data(self):
         try:
             self.df = pd.read_csv(self.data_path)
@@ -15,7 +37,36 @@ class DataProcessor:
             raise FileNotFoundError("CSV file not found. Please check the path.")
         return self.df
 
-    def preprocess(self):
+    def is_processed_current(self):
+        """
+        Checks whether save_path already holds an up-to-date processed copy of data_path:
+        it has a complete 'text' column, and data_path's source columns still match the
+        fingerprint recorded when it was saved. Comparing contents rather than mtimes also
+        catches in-place edits when save_path is data_path.
+        """
+        if not os.path.exists(self.save_path) or not os.path.exists(self.fingerprint_path):
+            return False
+        if os.path.exists(self.data_path) and os.path.getmtime(self.save_path) < os.path.getmtime(self.data_path):
+            return False
+        with open(self.fingerprint_path) as f:
+            recorded = f.read().strip()
+        same_file = os.path.abspath(self.save_path) == os.path.abspath(self.data_path)
+        source = self.df if self.df is not None else pd.read_csv(self.data_path, usecols=SOURCE_COLUMNS)
+        if source_fingerprint(source) != recorded:
+            return False
+        if same_file and self.df is not None:
+            return 'text' in self.df.columns and not self.df['text'].isna().any()
+        output = pd.read_csv(self.save_path, usecols=lambda column: column == 'text')
+        return 'text' in output.columns and not output['text'].isna().any()
+
+    def preprocess(self, skip_if_current=False):
+        if skip_if_current and self.is_processed_current():
+            if self.df is None or 'text' not in self.df.columns:
+                self.df = pd.read_csv(self.save_path)
+            self.df = self.df.fillna('')
+            print("Processed data is up to date; skipping preprocessing.")
+            return
+
         if self.df is None:
             self.load_data()
 
@@ -23,16 +74,19 @@ class DataProcessor:
         self.df = self.df.fillna('')
 
         # Create a single 'text' column for embedding. This combines all relevant information.
-        # Updated to use the correct column names provided by you.
-        self.df['text'] = self.df.apply(lambda row: 
-            f"Generic Name: {row['Generic Name']}. "
-            f"Brand Name: {row['Brand Name']}. "
-            f"Composition (Salt): {row['Salt']}. "
-            f"Manufacturer: {row['Manufacturer']}. "
-            f"Uses: {row['Uses']}. "
-            f"Side Effects: {row['Side Effects']}. "
-            f"Price: {row['Price']}.", axis=1
+        # Built column-wise rather than row by row so it stays fast on the full catalogue.
+        col = lambda name: self.df[name].astype(str)
+        self.df['text'] = (
+            "Generic Name: " + col('Generic Name') + ". "
+            "Brand Name: " + col('Brand Name') + ". "
+            "Composition (Salt): " + col('Salt') + ". "
+            "Manufacturer: " + col('Manufacturer') + ". "
+            "Uses: " + col('Uses') + ". "
+            "Side Effects: " + col('Side Effects') + ". "
+            "Price: " + col('Price') + "."
         )
+        # Numeric price, parsed once so price queries never re-parse strings
+        self.df['price_value'] = parse_prices(self.df['Price'])
         print("Data preprocessed and 'text' column created.")
 
     def save_processed_data(self):
@@ -42,5 +96,7 @@ class DataProcessor:
         # Ensure the directory exists
         os.makedirs(os.path.dirname(self.save_path), exist_ok=True)
         self.df.to_csv(self.save_path, index=False)
+        with open(self.fingerprint_path, 'w') as f:
+            f.write(source_fingerprint(self.df))
         print(f"Processed data saved to {self.save_path}")
         return self.df
@@ -3,41 +3,294 @@ from sentence_transformers import SentenceTransformer
 import faiss
 import numpy as np
 import os
+import time
+import json
+import hashlib
+from src.query_encoder import QueryEncoder
+
+# Supported index layouts. 'flat' is the exact brute-force baseline.
+INDEX_TYPES = ('flat', 'ivfpq', 'hnsw')
+MANIFEST_VERSION = 1
+
+
+def row_id(text):
+    """Stable 63-bit FAISS id for a row, derived from its 'text' column."""
+    return int.from_bytes(hashlib.sha1(text.encode('utf-8')).digest()[:8], 'big') & 0x7FFFFFFFFFFFFFFF
+
+
+def row_ids(data_df):
+    """Row ids for a DataFrame, reusing the precomputed 'faiss_id' column of a compiled catalogue."""
+    if 'faiss_id' in data_df.columns:
+        return data_df['faiss_id'].to_numpy(dtype='int64')
+    return np.fromiter((row_id(t) for t in data_df['text']), dtype='int64', count=len(data_df))
+
+
+def manifest_path(faiss_path):
+    return faiss_path + '.manifest.json'
+
+
+def build_index(embeddings, index_type='flat', ids=None, nlist=None, pq_m=None, hnsw_m=32, ef_construction=200):
+    """
+    Builds a FAISS index of the requested type over the given embeddings.
+
+    Args:
+        embeddings (np.ndarray): float32 matrix of shape (n, dim).
+        index_type (str): One of 'flat', 'ivfpq' or 'hnsw'.
+        ids (np.ndarray): Optional int64 ids. If given, the index is wrapped in an IndexIDMap.
+        nlist (int): Number of IVF cells. Defaults to ~4*sqrt(n), capped by the training set size.
+        pq_m (int): Number of PQ sub-quantizers. Must divide dim; defaults to the largest of 48/32/16/8 that does.
+            Codes are 8 bits, fewer when there are under 256 vectors to train them on; below
+            16 vectors an 'ivfpq' request builds a flat index instead.
+        hnsw_m (int): Graph degree for HNSW.
+        ef_construction (int): HNSW build-time search depth.
+
+    Returns:
+        faiss.Index: The trained index with the embeddings added.
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype='float32')
+    n, dim = embeddings.shape
+
+    if index_type == 'ivfpq' and n < 16:
+        print(f"Only {n} vectors; too few to train IVF-PQ, building a flat index instead.")
+        index_type = 'flat'
+
+    if index_type == 'flat':
+        index = faiss.IndexFlatL2(dim)
+    elif index_type == 'hnsw':
+        index = faiss.IndexHNSWFlat(dim, hnsw_m)
+        index.hnsw.efConstruction = ef_construction
+    elif index_type == 'ivfpq':
+        if nlist is None:
+            nlist = int(4 * np.sqrt(n))
+        # k-means wants ~39 points per centroid; never ask for more cells than we can train
+        nlist = max(1, min(nlist, n // 39 or 1))
+        if pq_m is None:
+            pq_m = next((m for m in (48, 32, 16, 8) if dim % m == 0), 1)
+        # Each sub-quantizer trains 2**nbits centroids, which needs at least that many vectors
+        nbits = min(8, int(np.log2(n)))
+        quantizer = faiss.IndexFlatL2(dim)
+        index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, nbits)
+    else:
+        raise ValueError(f"Unknown index type '{index_type}'. Expected one of {INDEX_TYPES}.")
+
+    if not index.is_trained:
+        index.train(embeddings)
+    if ids is None:
+        index.add(embeddings)
+    else:
+        index = faiss.IndexIDMap(index)
+        index.add_with_ids(embeddings, np.ascontiguousarray(ids, dtype='int64'))
+    return index
+
 
 class Embedder:
-    def __init__(self, embedding_model_name='all-MiniLM-L6-v2'):
+    def __init__(self, embedding_model_name='all-MiniLM-L6-v2', index_type=None, use_mmap=True,
+                 nprobe=16, ef_search=64, query_cache_size=None, batch_window_ms=None):
+        self.embedding_model_name = embedding_model_name
         self.embedding_model = SentenceTransformer(embedding_model_name)
+        # Cached / micro-batched encoding for single retrieval queries
+        self.query_encoder = QueryEncoder(
+            self.embedding_model,
+            cache_size=query_cache_size if query_cache_size is not None else int(os.getenv('QUERY_CACHE_SIZE', '1024')),
+            batch_window_ms=batch_window_ms if batch_window_ms is not None else float(os.getenv('QUERY_BATCH_WINDOW_MS', '5'))
+        )
         self.index = None
         self.data_df = None
+        self.index_type = index_type or os.getenv('FAISS_INDEX_TYPE', 'flat')
+        self.use_mmap = use_mmap
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        # FAISS id -> DataFrame position; None for legacy positional indexes without a manifest
+        self._id_to_pos = None
 
-    def create_vector_store(self, data_df, faiss_save_path):
+    def create_vector_store(self, data_df, faiss_save_path, incremental=False):
+        """
+        Embeds the 'text' column of data_df into an ID-mapped FAISS index and saves it.
+
+        Args:
+            data_df (pd.DataFrame): Preprocessed data with a 'text' column.
+            faiss_save_path (str): Where to write the index. A manifest is written next to it.
+            incremental (bool): If True and a compatible index + manifest exist, only rows whose
+                text changed are embedded/added/removed instead of re-encoding everything.
+        """
         self.data_df = data_df
-        print("Creating embeddings...")
-        embeddings = self.embedding_model.encode(self.data_df['text'].tolist())
+        ids = row_ids(data_df)
+        # Identical rows share an id; embed and store each one once
+        unique_ids, first_pos = np.unique(ids, return_index=True)
+
+        old_index, old_ids = self._load_for_update(faiss_save_path) if incremental else (None, None)
+        if old_index is not None:
+            removed = np.array(sorted(old_ids - set(unique_ids.tolist())), dtype='int64')
+            added_mask = ~np.isin(unique_ids, np.fromiter(old_ids, dtype='int64', count=len(old_ids)))
+            added_ids, added_pos = unique_ids[added_mask], first_pos[added_mask]
+            print(f"Incremental update: {len(added_ids)} added, {len(removed)} removed, "
+                  f"{len(unique_ids) - len(added_ids)} unchanged.")
+            try:
+                if len(removed):
+                    old_index.remove_ids(removed)
+                if len(added_ids):
+                    embeddings = self.embedding_model.encode(data_df['text'].iloc[added_pos].tolist())
+                    old_index.add_with_ids(np.ascontiguousarray(embeddings, dtype='float32'), added_ids)
+                self.index = old_index
+            except RuntimeError as e:
+                # e.g. HNSW cannot remove vectors; fall back to a full rebuild
+                print(f"Incremental update not supported for this index ({e}); rebuilding.")
+                self.index = None
+        else:
+            self.index = None
 
-        print("Creating FAISS index...")
-        self.index = faiss.IndexFlatL2(embeddings.shape[1])
-        self.index.add(embeddings)
+        if self.index is None:
+            print("Creating embeddings...")
+            embeddings = self.embedding_model.encode(data_df['text'].iloc[first_pos].tolist())
+            print(f"Creating FAISS index ({self.index_type})...")
+            self.index = build_index(embeddings, self.index_type, ids=unique_ids)
+        self._apply_search_params()
+        self._build_id_map(ids)
 
         print(f"Saving FAISS index to {faiss_save_path}")
         os.makedirs(os.path.dirname(faiss_save_path), exist_ok=True)
         faiss.write_index(self.index, faiss_save_path)
+        with open(manifest_path(faiss_save_path), 'w') as f:
+            json.dump({
+                'version': MANIFEST_VERSION,
+                'model': self.embedding_model_name,
+                'index_type': self.index_type,
+                'ids': unique_ids.tolist(),
+            }, f)
         print("Vector store created and saved.")
 
+    def _load_for_update(self, faiss_path):
+        """Returns (index, set of ids) from a compatible existing build, or (None, None)."""
+        manifest = self._read_manifest(faiss_path)
+        if manifest is None or not os.path.exists(faiss_path):
+            return None, None
+        if manifest.get('model') != self.embedding_model_name or manifest.get('index_type') != self.index_type:
+            print("Existing vector store was built with a different model or index type; rebuilding.")
+            return None, None
+        # Needs a writable in-RAM copy, so no mmap here
+        return faiss.read_index(faiss_path), set(manifest['ids'])
+
+    @staticmethod
+    def _read_manifest(faiss_path):
+        path = manifest_path(faiss_path)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            manifest = json.load(f)
+        return manifest if manifest.get('version') == MANIFEST_VERSION else None
+
+    def _build_id_map(self, ids):
+        id_to_pos = {}
+        for pos, rid in enumerate(ids.tolist()):
+            id_to_pos.setdefault(rid, pos)
+        self._id_to_pos = id_to_pos
+
+    def _positions(self, faiss_ids):
+        """Maps FAISS search results to DataFrame positions, dropping empty (-1) slots."""
+        if self._id_to_pos is None:
+            return [i for i in faiss_ids if i >= 0]
+        return [self._id_to_pos[i] for i in faiss_ids if i in self._id_to_pos]
+
     def load_vector_store(self, faiss_load_path, data_df):
         if not os.path.exists(faiss_load_path):
             raise FileNotFoundError(f"FAISS index not found at {faiss_load_path}.")
-        
+
         print(f"Loading FAISS index from {faiss_load_path}")
-        self.index = faiss.read_index(faiss_load_path)
+        self.index = None
+        if self.use_mmap:
+            # Memory-mapped, read-only, so workers on the host share one page-cached copy of the
+            # vectors: IO_FLAG_MMAP maps IVF inverted lists, IO_FLAG_MMAP_IFC (faiss >= 1.10)
+            # the codes of flat indexes, including HNSW's flat storage. The HNSW graph and IVF
+            # centroids are still read into each worker's RAM.
+            flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY | getattr(faiss, 'IO_FLAG_MMAP_IFC', 0)
+            try:
+                self.index = faiss.read_index(faiss_load_path, flags)
+            except RuntimeError as e:
+                print(f"Memory-mapped load not supported for this index ({e}); reading into RAM.")
+        if self.index is None:
+            self.index = faiss.read_index(faiss_load_path)
+        self._apply_search_params()
         self.data_df = data_df
+        if self._read_manifest(faiss_load_path) is not None:
+            self._build_id_map(row_ids(data_df))
+        else:
+            self._id_to_pos = None
         print("Vector store loaded successfully.")
 
+    def _apply_search_params(self):
+        # Search-time knobs only exist on approximate indexes; ParameterSpace ignores the rest
+        params = faiss.ParameterSpace()
+        for name, value in (('nprobe', self.nprobe), ('efSearch', self.ef_search)):
+            try:
+                params.set_index_parameter(self.index, name, value)
+            except RuntimeError:
+                pass
+
     def retrieve(self, query, top_k=5):
         if self.index is None:
             raise RuntimeError("Vector store not loaded. Call load_vector_store() first.")
-        
-        query_embedding = self.embedding_model.encode([query])
+
+        query_embedding = np.asarray(self.query_encoder.encode(query), dtype='float32').reshape(1, -1)
         D, I = self.index.search(query_embedding, top_k)
-        retrieved_indices = I.flatten().tolist()
-        return self.data_df.iloc[retrieved_indices]['text'].tolist()
\ No newline at end of file
+        retrieved_indices = self._positions(I.flatten().tolist())
+        return self.data_df.iloc[retrieved_indices]['text'].tolist()
+
+    def evaluate_index(self, queries, top_k=5):
+        """
+        Measures recall@k and search latency of the loaded index against an exact flat baseline.
+
+        Args:
+            queries (list): Query strings to evaluate with.
+            top_k (int): Number of neighbours to compare.
+
+        Returns:
+            dict: recall@k, mean per-query latency (ms) of both indexes and the speedup.
+        """
+        if self.index is None:
+            raise RuntimeError("Vector store not loaded. Call load_vector_store() first.")
+
+        query_embeddings = np.ascontiguousarray(self.embedding_model.encode(queries), dtype='float32')
+        # Exact baseline over the same rows the index was built from: one per distinct row id,
+        # or duplicates would fill its top k with rows the index only holds once
+        if self._id_to_pos is None:
+            positions = np.arange(len(self.data_df))
+        else:
+            positions = np.array(sorted(self._id_to_pos.values()), dtype='int64')
+        baseline = faiss.IndexFlatL2(self.index.d)
+        baseline.add(self.embedding_model.encode(self.data_df['text'].iloc[positions].tolist()))
+
+        start = time.perf_counter()
+        _, exact = baseline.search(query_embeddings, top_k)
+        flat_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+        start = time.perf_counter()
+        _, approx = self.index.search(query_embeddings, top_k)
+        index_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+        hits = sum(len({positions[i] for i in e if i >= 0} & set(self._positions(a)))
+                   for e, a in zip(exact.tolist(), approx.tolist()))
+        return {
+            'index_type': self.index_type,
+            'recall_at_k': hits / float(len(queries) * top_k),
+            'flat_latency_ms': flat_ms,
+            'index_latency_ms': index_ms,
+            'speedup': flat_ms / index_ms if index_ms else float('inf'),
+        }
+
+
+if __name__ == '__main__':
+    import argparse
+    from src.data_processor import DataProcessor
+
+    parser = argparse.ArgumentParser(description="Build or refresh the FAISS vector store.")
+    parser.add_argument('data_path', help="Medicine CSV to embed")
+    parser.add_argument('faiss_path', help="Where to write the FAISS index")
+    parser.add_argument('--index-type', choices=INDEX_TYPES, default=None)
+    parser.add_argument('--full', action='store_true', help="Re-embed every row instead of only changed ones")
+    args = parser.parse_args()
+
+    processor = DataProcessor(data_path=args.data_path, save_path=args.data_path)
+    processor.preprocess()
+    start = time.perf_counter()
+    Embedder(index_type=args.index_type).create_vector_store(processor.df, args.faiss_path, incremental=not args.full)
+    print(f"Done in {time.perf_counter() - start:.1f}s")
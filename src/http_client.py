@@ -0,0 +1,93 @@
+import threading
+from collections import Counter
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# (connect, read) seconds per host; anything else gets DEFAULT_TIMEOUT
+DEFAULT_TIMEOUT = (5, 30)
+HOST_TIMEOUTS = {
+    'openrouter.ai': (5, 60),
+    'api.pinata.cloud': (5, 60),
+    '127.0.0.1': (1, 30),
+    'localhost': (1, 30),
+}
+
+
+class HttpClient:
+    """
+    One pooled requests.Session for all outbound HTTP calls.
+
+    Connections are kept alive and reused per host, so repeated calls to the same API skip
+    the TCP and TLS handshakes. Connect errors are retried with backoff for every method,
+    since nothing reached the server. Read and 5xx retries only apply to idempotent
+    methods, so a POST is never sent twice. Without an explicit timeout, each host gets
+    its own (connect, read) timeout.
+    """
+    def __init__(self, pool_connections=10, pool_maxsize=20, retries=2, backoff_factor=0.3,
+                 host_timeouts=None, default_timeout=DEFAULT_TIMEOUT):
+        self.host_timeouts = dict(HOST_TIMEOUTS, **(host_timeouts or {}))
+        self.default_timeout = default_timeout
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(502, 503, 504),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        self.adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+        self.requests_by_host = Counter()
+        self.errors_by_host = Counter()
+        self.lock = threading.Lock()
+
+    def timeout_for(self, url):
+        return self.host_timeouts.get(urlsplit(url).hostname, self.default_timeout)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout_for(url))
+        host = urlsplit(url).hostname
+        with self.lock:
+            self.requests_by_host[host] += 1
+        try:
+            return self.session.request(method, url, **kwargs)
+        except requests.RequestException:
+            with self.lock:
+                self.errors_by_host[host] += 1
+            raise
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def stats(self):
+        """Per-host request counts plus connection reuse from the urllib3 pools"""
+        pools = {}
+        manager = self.adapter.poolmanager
+        for key in manager.pools.keys():
+            pool = manager.pools.get(key)
+            if pool is None:
+                continue
+            opened = pool.num_connections
+            pools[f"{key.key_scheme}://{key.key_host}:{key.key_port}"] = {
+                'connections_opened': opened,
+                'requests': pool.num_requests,
+                'reused': max(0, pool.num_requests - opened),
+                'idle': pool.pool.qsize() if pool.pool is not None else 0,
+                'max_size': pool.pool.maxsize if pool.pool is not None else 0
+            }
+        with self.lock:
+            return {
+                'requests_by_host': dict(self.requests_by_host),
+                'errors_by_host': dict(self.errors_by_host),
+                'pools': pools
+            }
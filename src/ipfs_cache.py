@@ -0,0 +1,220 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+class PdfDiskCache:
+    """
+    Bounded on-disk cache of IPFS downloads, keyed by CID.
+
+    CIDs are content addresses, so a cached file never goes stale and hits are served
+    without revalidation. Access time is tracked with the file mtime and the least recently
+    used files are evicted once the directory exceeds max_bytes. Files are only ever
+    published with os.replace, so readers in other workers never see partial downloads.
+    """
+    def __init__(self, directory='data/cache/ipfs', max_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, cid):
+        if not cid.isalnum():
+            raise ValueError(f"Invalid CID: {cid!r}")
+        return os.path.join(self.directory, f"{cid}.pdf")
+
+    def temp_path_for(self, cid):
+        return os.path.join(self.directory, f"{cid}.{uuid.uuid4().hex}.part")
+
+    def get(self, cid):
+        """Returns the cached file path for cid, or None"""
+        path = self.path_for(cid)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            with self.lock:
+                self.misses += 1
+            return None
+        with self.lock:
+            self.hits += 1
+        return path
+
+    def put(self, cid, temp_path):
+        """Publishes a finished download and evicts old entries. Returns the cached path."""
+        path = self.path_for(cid)
+        os.replace(temp_path, path)
+        self._evict(keep=path)
+        return path
+
+    def _entries(self, stale_after=3600):
+        entries = []
+        now = time.time()
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith('.part'):
+                    # Leftovers from a worker that died mid-download
+                    try:
+                        if entry.stat().st_mtime < now - stale_after:
+                            os.remove(entry.path)
+                    except FileNotFoundError:
+                        pass
+                elif entry.name.endswith('.pdf'):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _evict(self, keep=None):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            with self.lock:
+                self.evictions += 1
+
+    def stats(self):
+        entries = self._entries()
+        with self.lock:
+            return {
+                'directory': self.directory,
+                'entries': len(entries),
+                'bytes': sum(size for _, size, _ in entries),
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+
+def _discard_result(future):
+    if not future.cancelled() and future.exception() is None:
+        try:
+            os.remove(future.result())
+        except FileNotFoundError:
+            pass
+
+
+class GatewayRacer:
+    """
+    Fetches a CID from several IPFS gateways at once and keeps the first complete response.
+
+    Each gateway streams into its own temp file in chunks, so large PDFs are never held in
+    memory. As soon as one finishes, the others are told to stop and their partial files
+    are removed. Concurrent requests for the same CID share a single download.
+    """
+    def __init__(self, http_client, cache, gateways, max_bytes=50 * 1024 * 1024,
+                 chunk_size=64 * 1024, timeout=30, max_workers=16, logger=None):
+        self.http_client = http_client
+        self.cache = cache
+        self.gateways = gateways
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ipfs')
+        self.logger = logger
+        self._pending = {}  # cid -> Event set when that download finishes
+        self._pending_lock = threading.Lock()
+
+    def _log(self, level, message):
+        if self.logger:
+            getattr(self.logger, level)(message)
+
+    def fetch(self, cid):
+        """Returns a local path to the PDF for cid, downloading it if it isn't cached"""
+        path = self.cache.get(cid)
+        if path:
+            return path
+
+        with self._pending_lock:
+            done = self._pending.get(cid)
+            leader = done is None
+            if leader:
+                done = self._pending[cid] = threading.Event()
+        if not leader:
+            done.wait(self.timeout)
+            path = self.cache.get(cid)
+            if path:
+                return path
+            raise Exception(f"Failed to download CID {cid} from all IPFS gateways")
+
+        try:
+            return self._race(cid)
+        finally:
+            with self._pending_lock:
+                self._pending.pop(cid, None)
+            done.set()
+
+    def _race(self, cid):
+        stop = threading.Event()
+        futures = {
+            self.executor.submit(self._download, gateway.format(cid=cid), cid, stop): gateway
+            for gateway in self.gateways
+        }
+        deadline = time.time() + self.timeout
+        errors = []
+        try:
+            while futures:
+                finished, _ = wait(list(futures), timeout=max(0, deadline - time.time()),
+                                   return_when=FIRST_COMPLETED)
+                if not finished:
+                    break
+                for future in finished:
+                    url = futures.pop(future).format(cid=cid)
+                    try:
+                        temp_path = future.result()
+                    except Exception as e:
+                        errors.append(e)
+                        self._log('warning', f"❌ Failed to download from {url}: {e}")
+                        continue
+                    self._log('info', f"✅ Successfully downloaded from {url}")
+                    return self.cache.put(cid, temp_path)
+        finally:
+            stop.set()
+            # Losers that still finish successfully must not leave their temp file behind
+            for future in futures:
+                future.add_done_callback(_discard_result)
+        last_error = errors[-1] if errors else 'timed out'
+        raise Exception(f"Failed to download CID {cid} from all IPFS gateways. Last error: {last_error}")
+
+    def _download(self, url, cid, stop):
+        temp_path = self.cache.temp_path_for(cid)
+        try:
+            with self.http_client.get(url, stream=True) as response:
+                response.raise_for_status()
+                written = 0
+                with open(temp_path, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=self.chunk_size):
+                        if stop.is_set():
+                            raise Exception("cancelled, another gateway finished first")
+                        if written == 0 and not chunk.startswith(b'%PDF'):
+                            raise Exception("response is not a PDF")
+                        written += len(chunk)
+                        if written > self.max_bytes:
+                            raise Exception(f"larger than {self.max_bytes} bytes")
+                        f.write(chunk)
+                if written == 0:
+                    raise Exception("empty response")
+            if stop.is_set():
+                raise Exception("cancelled, another gateway finished first")
+            return temp_path
+        except Exception:
+            try:
+                os.remove(temp_path)
+            except FileNotFoundError:
+                pass
+            raise
@@ -0,0 +1,130 @@
+from collections import deque
+
+
+def _is_word_char(ch):
+    # Mirrors the definition of \w used by the `re` module for str patterns
+    return ch.isalnum() or ch == '_'
+
+
+class NameMatcher:
+    """
+    Multi-pattern matcher for medicine names built on an Aho-Corasick automaton.
+
+    The automaton is built once from one or more name lists (e.g. generic names and
+    brand names) and then finds every name occurring in a text in a single linear
+    pass, instead of running one regex per name.
+    """
+    def __init__(self, *name_lists):
+        self.name_lists = [list(names) for names in name_lists]
+
+        # Trie / automaton state: transitions, failure links, per-node pattern ids
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        self._dict_link = [0]
+
+        # pattern id -> (pattern length, [(list index, position in list), ...])
+        self._patterns = []
+        self._pattern_ids = {}
+        # Empty names match trivially; tracked separately since they have no trie path
+        self._empty = []
+
+        for list_idx, names in enumerate(self.name_lists):
+            for pos, name in enumerate(names):
+                pattern = str(name).lower()
+                if not pattern:
+                    self._empty.append((list_idx, pos))
+                    continue
+                pid = self._pattern_ids.get(pattern)
+                if pid is None:
+                    pid = len(self._patterns)
+                    self._pattern_ids[pattern] = pid
+                    self._patterns.append((len(pattern), []))
+                    self._insert(pattern, pid)
+                self._patterns[pid][1].append((list_idx, pos))
+
+        self._build_links()
+
+    def _insert(self, pattern, pid):
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._dict_link.append(0)
+            node = nxt
+        self._out[node].append(pid)
+
+    def _build_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                # Nearest proper suffix state that itself ends a pattern
+                f = self._fail[child]
+                self._dict_link[child] = f if self._out[f] else self._dict_link[f]
+                queue.append(child)
+
+    def _scan(self, text):
+        """Yield (pattern id, end index) for every pattern occurrence in text."""
+        goto, fail, out, dict_link = self._goto, self._fail, self._out, self._dict_link
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            hit = node if out[node] else dict_link[node]
+            while hit:
+                for pid in out[hit]:
+                    yield pid, i + 1
+                hit = dict_link[hit]
+
+    def search(self, text, word_boundaries=True):
+        """
+        Finds all names occurring in the given text (case-insensitive).
+
+        Args:
+            text (str): The text to search.
+            word_boundaries (bool): If True, a name only matches when it is delimited the
+                same way as the regex r'\\b<name>\\b'. If False, plain substring matching.
+
+        Returns:
+            tuple: One list per input name list, holding the matched names in their
+                original order (duplicates in the input are preserved).
+        """
+        text = text.lower()
+        matched = set()
+        for pid, end in self._scan(text):
+            if pid in matched:
+                continue
+            if word_boundaries:
+                start = end - self._patterns[pid][0]
+                if not (self._is_boundary(text, start) and self._is_boundary(text, end)):
+                    continue
+            matched.add(pid)
+
+        positions = [pos for pid in matched for pos in self._patterns[pid][1]]
+        # An empty name matches like '' in text / re.search(r'\b\b', text)
+        if self._empty and (not word_boundaries or any(_is_word_char(ch) for ch in text)):
+            positions.extend(self._empty)
+        positions.sort()
+
+        results = tuple([] for _ in self.name_lists)
+        for list_idx, pos in positions:
+            results[list_idx].append(self.name_lists[list_idx][pos])
+        return results
+
+    @staticmethod
+    def _is_boundary(text, idx):
+        before = idx > 0 and _is_word_char(text[idx - 1])
+        after = idx < len(text) and _is_word_char(text[idx])
+        return before != after
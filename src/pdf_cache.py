@@ -0,0 +1,151 @@
+import hashlib
+import json
+import threading
+import time
+
+from src.cache_backends import SQLiteConnections
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def document_key(cid=None, path=None):
+    """Cache key for a PDF: its CID when it came from IPFS, otherwise the file's SHA-256"""
+    if cid:
+        return f"cid:{cid}"
+    return f"sha256:{file_sha256(path)}"
+
+
+def chunk_text(text, chunk_size=800, overlap=100):
+    """
+    Splits text into overlapping windows of about chunk_size characters, cut at whitespace
+    where possible. Returns a list of (start, end) character offsets into text.
+    """
+    spans = []
+    start, length = 0, len(text)
+    while start < length:
+        end = min(length, start + chunk_size)
+        if end < length:
+            cut = text.rfind(' ', start + chunk_size // 2, end)
+            if cut != -1:
+                end = cut
+        if text[start:end].strip():
+            spans.append((start, end))
+        if end >= length:
+            break
+        start = max(end - overlap, start + 1)
+    return spans
+
+
+class PdfTextCache(SQLiteConnections):
+    """
+    Persistent cache of PDF text extraction results and chunk embeddings.
+
+    Keyed by document_key(), so the same report attached again, or by another worker, skips
+    PyPDF2 entirely. Extracted text is stored with the character offset where each page
+    starts. Chunk spans and their embeddings are stored per embedding model. The least
+    recently used documents are dropped beyond max_documents.
+    """
+    def __init__(self, path='data/cache/pdf_text.sqlite3', max_documents=500):
+        self.max_documents = max_documents
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._open_connections(path)
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS pdf_text (
+                key TEXT PRIMARY KEY,
+                text TEXT NOT NULL,
+                page_offsets TEXT NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS pdf_chunks (
+                key TEXT NOT NULL,
+                model TEXT NOT NULL,
+                spans TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                vectors BLOB NOT NULL,
+                PRIMARY KEY (key, model)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_pdf_text_accessed ON pdf_text (accessed_at)")
+
+    def _count(self, hit):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get_text(self, key):
+        """Returns (text, page_offsets) or None"""
+        conn = self._conn()
+        row = conn.execute("SELECT text, page_offsets FROM pdf_text WHERE key = ?", (key,)).fetchone()
+        self._count(row is not None)
+        if row is None:
+            return None
+        conn.execute("UPDATE pdf_text SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        return row[0], json.loads(row[1])
+
+    def put_text(self, key, text, page_offsets):
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO pdf_text (key, text, page_offsets, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, text, json.dumps(page_offsets), time.time())
+        )
+        overflow = conn.execute("SELECT COUNT(*) FROM pdf_text").fetchone()[0] - self.max_documents
+        if overflow > 0:
+            stale = [r[0] for r in conn.execute(
+                "SELECT key FROM pdf_text ORDER BY accessed_at ASC LIMIT ?", (overflow,)
+            )]
+            conn.executemany("DELETE FROM pdf_text WHERE key = ?", [(k,) for k in stale])
+            conn.executemany("DELETE FROM pdf_chunks WHERE key = ?", [(k,) for k in stale])
+
+    def get_chunks(self, key, model):
+        """Returns (spans, vectors) for key under embedding model, or None"""
+        row = self._conn().execute(
+            "SELECT spans, dim, vectors FROM pdf_chunks WHERE key = ? AND model = ?", (key, model)
+        ).fetchone()
+        if row is None:
+            return None
+        import numpy as np
+        spans = [tuple(span) for span in json.loads(row[0])]
+        vectors = np.frombuffer(row[2], dtype='float32').reshape(-1, row[1])
+        return spans, vectors
+
+    def put_chunks(self, key, model, spans, vectors):
+        import numpy as np
+        vectors = np.ascontiguousarray(vectors, dtype='float32')
+        self._conn().execute(
+            "INSERT OR REPLACE INTO pdf_chunks (key, model, spans, dim, vectors) VALUES (?, ?, ?, ?, ?)",
+            (key, model, json.dumps(spans), vectors.shape[1], vectors.tobytes())
+        )
+
+    def clear(self):
+        conn = self._conn()
+        conn.execute("DELETE FROM pdf_text")
+        conn.execute("DELETE FROM pdf_chunks")
+
+    def stats(self):
+        conn = self._conn()
+        documents = conn.execute("SELECT COUNT(*) FROM pdf_text").fetchone()[0]
+        embedded = conn.execute("SELECT COUNT(*) FROM pdf_chunks").fetchone()[0]
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'path': self.path,
+                'documents': documents,
+                'embedded_documents': embedded,
+                'max_documents': self.max_documents,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,143 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers):
+    """
+    Process pool shared by all requests in this worker, created and sized on first use.
+    It is never replaced, so one request can't shut down a pool another is still using.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # forkserver children don't inherit the parent's threads, locks or loaded models
+            method = os.getenv('PDF_EXTRACT_MP_CONTEXT') or 'forkserver'
+            if method not in multiprocessing.get_all_start_methods():
+                method = None
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method))
+        return _pool
+
+
+def _forget_pool():
+    # A pool's worker processes and queue threads belong to the parent; the child starts its own
+    global _pool, _pool_lock
+    _pool = None
+    _pool_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_forget_pool)
+
+
+def _extract_range(pdf_path, start, end):
+    # Runs in a pool process; PyPDF2 objects can't be pickled, so each batch reopens the file
+    import PyPDF2
+    with open(pdf_path, 'rb') as f:
+        reader = PyPDF2.PdfReader(f)
+        return [reader.pages[i].extract_text() or '' for i in range(start, end)]
+
+
+class ExtractionResult:
+    """Text of a PDF plus what was read. truncated names the budget that stopped extraction, if any."""
+    def __init__(self, text, page_offsets, pages_total, truncated=None):
+        self.text = text
+        self.page_offsets = page_offsets
+        self.pages_total = pages_total
+        self.pages_read = len(page_offsets)
+        self.truncated = truncated
+
+
+def iter_pdf_pages(pdf_path, max_pages=None, max_chars=None, time_budget=None, workers=None,
+                   parallel_threshold=16, batch_size=8, stats=None):
+    """
+    Yields (page_number, text) for each page in order, as soon as it is decoded.
+
+    Small documents are read in-process. From parallel_threshold pages up, batches of
+    batch_size pages are decoded in a process pool, and pages are still yielded in order
+    while later batches are decoding.
+
+    Args:
+        pdf_path (str): Path to the PDF.
+        max_pages (int): Stop after this many pages.
+        max_chars (int): Stop once this many characters have been yielded. The last page is
+            cut to fit.
+        time_budget (float): Stop once this many seconds have passed.
+        workers (int): Pool size, fixed by the first call that creates the pool. Defaults to
+            the CPU count; 1 disables the pool.
+        stats (dict): If given, filled with 'pages_total' and 'truncated' (the budget hit,
+            or None).
+    """
+    import PyPDF2
+    stats = stats if stats is not None else {}
+    start_time = time.perf_counter()
+    with open(pdf_path, 'rb') as f:
+        reader = PyPDF2.PdfReader(f)
+        pages_total = len(reader.pages)
+        stats['pages_total'] = pages_total
+        stats['truncated'] = None
+        limit = min(pages_total, max_pages) if max_pages else pages_total
+        if limit < pages_total:
+            stats['truncated'] = 'max_pages'
+
+        workers = workers or os.cpu_count() or 1
+        if workers <= 1 or limit < parallel_threshold:
+            pages = ((i, reader.pages[i].extract_text() or '') for i in range(limit))
+            yield from _within_budget(pages, max_chars, time_budget, start_time, stats)
+            return
+
+    pool = _get_pool(workers)
+    futures = [pool.submit(_extract_range, pdf_path, s, min(s + batch_size, limit))
+               for s in range(0, limit, batch_size)]
+
+    def ordered():
+        for batch_no, future in enumerate(futures):
+            remaining = None
+            if time_budget is not None:
+                remaining = max(0.0, time_budget - (time.perf_counter() - start_time))
+            for offset, text in enumerate(future.result(timeout=remaining)):
+                yield batch_no * batch_size + offset, text
+
+    try:
+        yield from _within_budget(ordered(), max_chars, time_budget, start_time, stats)
+    except TimeoutError:
+        stats['truncated'] = 'time_budget'
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def _within_budget(pages, max_chars, time_budget, start_time, stats):
+    chars = 0
+    for page_no, text in pages:
+        if max_chars is not None and chars + len(text) > max_chars:
+            text = text[:max_chars - chars]
+            stats['truncated'] = 'max_chars'
+        chars += len(text)
+        yield page_no, text
+        if stats['truncated'] == 'max_chars':
+            return
+        if time_budget is not None and time.perf_counter() - start_time > time_budget:
+            stats['truncated'] = 'time_budget'
+            return
+
+
+def extract_pdf(pdf_path, **limits):
+    """
+    Extracts a PDF's text within the given budgets (see iter_pdf_pages).
+
+    Returns:
+        ExtractionResult: text, page_offsets (start of each page in text), pages_total,
+            pages_read and truncated.
+    """
+    stats = {}
+    parts, page_offsets, position = [], [], 0
+    for _, text in iter_pdf_pages(pdf_path, stats=stats, **limits):
+        page_offsets.append(position)
+        parts.append(text)
+        position += len(text)
+    return ExtractionResult(''.join(parts), page_offsets, stats.get('pages_total', 0), stats.get('truncated'))
@@ -0,0 +1,94 @@
+import bisect
+import threading
+
+
+class PdfChunkIndex:
+    """
+    Inner-product FAISS index over one PDF's chunk embeddings.
+
+    Questions get only their top-k chunks, instead of the whole document or a fixed
+    prefix of it. Retrieved chunks are put back in document order and labelled with their
+    page, so the model reads them as excerpts of the report.
+    """
+    def __init__(self, text, spans, vectors, page_offsets=None):
+        import faiss
+        import numpy as np
+        self.text = text
+        self.spans = list(spans)
+        self.page_offsets = page_offsets or []
+        vectors = np.array(vectors, dtype='float32')
+        faiss.normalize_L2(vectors)
+        self.index = faiss.IndexFlatIP(vectors.shape[1])
+        self.index.add(vectors)
+
+    def page_of(self, offset):
+        return max(1, bisect.bisect_right(self.page_offsets, offset)) if self.page_offsets else None
+
+    def _render(self, chunk_ids, max_chars):
+        parts, used = [], 0
+        for chunk_id in chunk_ids:
+            start, end = self.spans[chunk_id]
+            if parts and used + (end - start) > max_chars:
+                break
+            parts.append((chunk_id, start, end))
+            used += end - start
+        excerpts = []
+        for _, start, end in sorted(parts):
+            page = self.page_of(start)
+            label = f"[Page {page}] " if page else ""
+            excerpts.append(f"{label}{self.text[start:end].strip()}")
+        return "\n...\n".join(excerpts)
+
+    def search(self, query_vector, top_k=5, max_chars=6000):
+        """Context made of the top_k chunks most similar to the query, within max_chars"""
+        if not self.spans:
+            return ""
+        import faiss
+        import numpy as np
+        query = np.array(query_vector, dtype='float32').reshape(1, -1)
+        faiss.normalize_L2(query)
+        _, ids = self.index.search(query, min(top_k, len(self.spans)))
+        return self._render([int(i) for i in ids[0] if i >= 0], max_chars)
+
+    def overview(self, max_chars=6000):
+        """Context made of chunks spread evenly over the document, for summaries"""
+        if not self.spans:
+            return ""
+        average = sum(end - start for start, end in self.spans) / len(self.spans)
+        count = max(1, min(len(self.spans), int(max_chars // max(average, 1))))
+        step = len(self.spans) / count
+        return self._render([int(i * step) for i in range(count)], max_chars)
+
+
+class PromptSizeStats:
+    """Characters sent as PDF context per question, against what stuffing the full text would send."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.questions = 0
+        self.retrieved = 0
+        self.context_chars = 0
+        self.document_chars = 0
+        self.truncated_chars = 0
+        self.retrieval_seconds = 0.0
+
+    def record(self, context_chars, document_chars, seconds, retrieved, truncate_at=12000):
+        with self.lock:
+            self.questions += 1
+            self.retrieved += int(retrieved)
+            self.context_chars += context_chars
+            self.document_chars += document_chars
+            self.truncated_chars += min(document_chars, truncate_at)
+            self.retrieval_seconds += seconds
+
+    def stats(self):
+        with self.lock:
+            n = self.questions
+            return {
+                'questions': n,
+                'retrieved': self.retrieved,
+                'avg_context_chars': self.context_chars / n if n else 0,
+                'avg_full_document_chars': self.document_chars / n if n else 0,
+                'avg_truncated_prefix_chars': self.truncated_chars / n if n else 0,
+                'context_vs_full_document': self.context_chars / self.document_chars if self.document_chars else 0,
+                'avg_retrieval_ms': self.retrieval_seconds * 1000 / n if n else 0
+            }
@@ -1,44 +1,146 @@
 import os
 import re
 from groq import Groq
-from src.data_processor import DataProcessor
+from src.data_processor import DataProcessor, parse_prices
 from src.embedder import Embedder
+from src.name_matcher import NameMatcher
+from src.recommender_engine import RecommenderEngine
+from src.price_index import PriceIndex
+from src.catalogue import catalogue_path_for, is_catalogue_current, load_catalogue
 
 class RAGPipeline:
+    # Start of the text run()/run_stream() answer with when the Groq call fails
+    GENERATION_ERROR = "Sorry, an error occurred during Groq API generation"
+
     def __init__(self, faiss_path, data_path):
         # Hardcode the Groq model name here
         self.model_name = "llama-3.1-8b-instant"  # or "llama-3.1-8b-instant" if that's your model
         self.faiss_path = faiss_path
         self.data_path = data_path
 
-        # Load and preprocess data
-        processor = DataProcessor(data_path=self.data_path, save_path=self.data_path)
-        self.df = processor.load_data()
-        processor.preprocess()
-        self.df = processor.df
+        # Prefer the compiled, memory-mapped catalogue; fall back to the CSV
+        self.catalogue_path = catalogue_path_for(self.data_path)
+        if is_catalogue_current(self.data_path, self.catalogue_path):
+            self.df = load_catalogue(self.catalogue_path)
+        else:
+            processor = DataProcessor(data_path=self.data_path, save_path=self.data_path)
+            self.df = processor.load_data()
+            processor.preprocess(skip_if_current=True)
+            self.df = processor.df
+        if 'price_value' not in self.df.columns:
+            self.df['price_value'] = parse_prices(self.df['Price'])
 
         # Medicine and brand names for detection
         self.generic_meds = self.df['Generic Name'].dropna().tolist()
         self.brand_names = self.df['Brand Name'].dropna().tolist()
+        # Built once so every lookup is a single pass over the text
+        self.name_matcher = NameMatcher(self.generic_meds, self.brand_names)
+        # Salt/brand indexes for alternative lookups
+        self.recommender = RecommenderEngine(self.df)
+        self.price_index = PriceIndex(self.df)
 
         # Load embedding store
         self.embedder = Embedder()
         self.embedder.load_vector_store(faiss_load_path=self.faiss_path, data_df=self.df)
 
-        # Initialize Groq API client
-        self.client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+        # Groq client is created on first completion, so retrieval works without an API key
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+        return self._client
 
     def _extract_medicine_types(self, query):
-        query_lower = query.lower()
-        matched_generic = [med for med in self.generic_meds if re.search(r'\b' + re.escape(med.lower()) + r'\b', query_lower)]
-        matched_brand = [brand for brand in self.brand_names if re.search(r'\b' + re.escape(brand.lower()) + r'\b', query_lower)]
+        matched_generic, matched_brand = self.name_matcher.search(query)
         return matched_generic, matched_brand
 
+    def _complete(self, prompt):
+        try:
+            result = self.client.chat.completions.create(
+                model=self.model_name,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.7,
+                max_tokens=500,
+                top_p=0.9
+            )
+            return result.choices[0].message.content.strip()
+        except Exception as e:
+            return f"{self.GENERATION_ERROR}: {e}"
+
+    def _complete_stream(self, prompt):
+        try:
+            stream = self.client.chat.completions.create(
+                model=self.model_name,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.7,
+                max_tokens=500,
+                top_p=0.9,
+                stream=True
+            )
+            for chunk in stream:
+                token = chunk.choices[0].delta.content
+                if token:
+                    yield token
+        except Exception as e:
+            yield f"{self.GENERATION_ERROR}: {e}"
+
     def run(self, user_query: str, context: str = None) -> str:
+        answer, prompt = self._prepare(user_query, context)
+        return answer if prompt is None else self._complete(prompt)
+
+    def run_stream(self, user_query: str, context: str = None):
+        """Same as run(), but yields the answer in chunks as the model generates it."""
+        answer, prompt = self._prepare(user_query, context)
+        if prompt is None:
+            yield answer
+            return
+        yield from self._complete_stream(prompt)
+
+    def _prepare(self, user_query, context=None):
+        """
+        Runs every step of the pipeline short of generation.
+
+        Returns:
+            tuple: (answer, None) when the query is answered directly from the database,
+                or (None, prompt) when the prompt still needs an LLM completion.
+        """
+        retrieval = self.retrieve(user_query, context)
+        return retrieval['answer'], retrieval['prompt']
+
+    def brand_salts(self, brands):
+        """Maps each brand name to the distinct salts listed for it in the catalogue."""
+        salts = {}
+        for brand in brands:
+            rows = self.recommender.brand_index.get(str(brand).lower(), [])
+            values = (self.df['Salt'].iat[row] for row in rows)
+            salts[brand] = list(dict.fromkeys(v for v in values if isinstance(v, str) and v))
+        return salts
+
+    def retrieve(self, user_query, context=None):
+        """
+        Retrieval and prompt building without generation.
+
+        Args:
+            user_query (str): The user's question.
+            context (str): PDF text to answer from instead of the medicine database.
+
+        Returns:
+            dict: 'answer' (a reply built straight from the database, or None), 'prompt'
+                (the completion prompt when an LLM is still needed, or None), 'context' (the
+                retrieved database or PDF text), 'generics' and 'brands' (medicine names
+                matched in the query) and 'salts' (brand -> salts).
+        """
         greetings = ["hi", "hello", "hey", "good morning", "good evening"]
         user_query_clean = user_query.strip().lower()
         if user_query_clean in greetings:
-            return "Hello! How can I help you with medicine information today?"
+            return self._retrieval("Hello! How can I help you with medicine information today?")
+
+        matched_generic, matched_brand = self._extract_medicine_types(user_query)
+
+        def result(answer=None, prompt=None, context_text=None):
+            return self._retrieval(answer, prompt, context_text, matched_generic, matched_brand)
 
         # If context (PDF text) is provided
         if context is not None:
@@ -46,24 +148,12 @@ class RAGPipeline:
             summary_keywords = ["summarize", "summary", "report", "overview"]
             if any(kw in user_query.lower() for kw in summary_keywords):
                 prompt = f"You are a helpful assistant. Use only the following context to answer the user's question. Be concise.\n\nContext:\n{context}\n\nUser's Question:\n{user_query}\n\nAnswer:"
-                try:
-                    result = self.client.chat.completions.create(
-                        model=self.model_name,
-                        messages=[{"role": "user", "content": prompt}],
-                        temperature=0.7,
-                        max_tokens=500,
-                        top_p=0.9
-                    )
-                    return result.choices[0].message.content.strip()
-                except Exception as e:
-                    return f"Sorry, an error occurred during Groq API generation: {e}"
+                return result(prompt=prompt, context_text=context)
                 # If the user asks what medicines are used in the PDF, extract from context
                 medicine_keywords = ["medicine", "medicines", "drugs", "used in this pdf", "used in this report", "prescribed"]
                 if any(kw in user_query.lower() for kw in medicine_keywords) and ("used" in user_query.lower() or "in this pdf" in user_query.lower() or "in this report" in user_query.lower()):
-                    found_meds = []
-                    for med in self.generic_meds + self.brand_names:
-                        if med.lower() in context.lower():
-                            found_meds.append(med)
+                    found_generic, found_brand = self.name_matcher.search(context, word_boundaries=False)
+                    found_meds = found_generic + found_brand
                     if found_meds:
                         # Get details from database for found medicines
                         df_filtered = self.df[
@@ -81,16 +171,16 @@ class RAGPipeline:
                                 summary_lines.append(line)
                             summary = " ".join(summary_lines)
                             advice = "However, please note that for any medical condition, always consult a qualified healthcare professional for diagnosis and treatment."
-                            return f"Based on the PDF, the following medicines are prescribed: {summary} {advice}"
+                            return result(f"Based on the PDF, the following medicines are prescribed: {summary} {advice}")
                         else:
-                            return f"The following medicines were found in the PDF: {', '.join(found_meds)}. Please consult a healthcare professional for more details."
+                            return result(f"The following medicines were found in the PDF: {', '.join(found_meds)}. Please consult a healthcare professional for more details.")
                     else:
-                        return "No medicines were found in the PDF."
+                        return result("No medicines were found in the PDF.")
             # If the user asks about a medicine, cross-reference with database
-            matched_generic, matched_brand = self._extract_medicine_types(user_query)
+            context_lower = context.lower()
             found_meds = []
             for med in matched_generic + matched_brand:
-                if med.lower() in context.lower():
+                if med.lower() in context_lower:
                     found_meds.append(med)
             if found_meds:
                 # Get details from database
@@ -102,30 +192,10 @@ class RAGPipeline:
                     med_info = df_filtered.to_dict(orient='records')
                     med_details = '\n'.join([str(info) for info in med_info])
                     prompt = f"The following medicine(s) were found in the report and database.\n{med_details}\n\nUser's Question:\n{user_query}\n\nAnswer:"
-                    try:
-                        result = self.client.chat.completions.create(
-                            model=self.model_name,
-                            messages=[{"role": "user", "content": prompt}],
-                            temperature=0.7,
-                            max_tokens=500,
-                            top_p=0.9
-                        )
-                        return result.choices[0].message.content.strip()
-                    except Exception as e:
-                        return f"Sorry, an error occurred during Groq API generation: {e}"
+                    return result(prompt=prompt, context_text=med_details)
             # If no medicine found, fallback to PDF text only
             prompt = f"Use only the following context to answer the user's question.\n\nContext:\n{context}\n\nUser's Question:\n{user_query}\n\nAnswer:"
-            try:
-                result = self.client.chat.completions.create(
-                    model=self.model_name,
-                    messages=[{"role": "user", "content": prompt}],
-                    temperature=0.7,
-                    max_tokens=500,
-                    top_p=0.9
-                )
-                return result.choices[0].message.content.strip()
-            except Exception as e:
-                return f"Sorry, an error occurred during Groq API generation: {e}"
+            return result(prompt=prompt, context_text=context)
 
         symptom_keywords = [
             "i have", "my symptoms", "i feel", "i am suffering",
@@ -141,25 +211,40 @@ class RAGPipeline:
                 "Always consult a qualified healthcare provider for diagnosis and treatment.\n\n"
             )
 
+        alternative_keywords = ['alternative', 'substitute', 'equivalent', 'generic for', 'generic version']
+        if any(ak in user_query.lower() for ak in alternative_keywords):
+            if matched_brand:
+                brand = matched_brand[0]
+                alternatives, message = self.recommender.find_alternatives(brand, top_n=5)
+                if alternatives is None:
+                    return result(f"{message} ({brand})")
+                meds_list = '\n'.join(
+                    f"- {row['Brand Name']} by {row['Manufacturer']}: {row['Price']}"
+                    for row in alternatives.to_dict(orient='records'))
+                return result(f"{disclaimer}Alternatives to {brand} with the same composition, cheapest first:\n{meds_list}")
+
         price_keywords = ['price', 'cheapest', 'lowest price', 'least cost', 'cost effective']
         if any(pk in user_query.lower() for pk in price_keywords):
-            matched_generic, matched_brand = self._extract_medicine_types(user_query)
-            df_filtered = self.df[
-                (self.df['Generic Name'].isin(matched_generic)) |
-                (self.df['Brand Name'].isin(matched_brand))
-            ] if (matched_generic or matched_brand) else self.df
-            if df_filtered.empty:
-                return "Sorry, no matching price information found."
-            df_filtered = df_filtered.copy()
-            df_filtered['Price'] = df_filtered['Price'].str.replace('₹', '', regex=False).astype(float)
-            min_price = df_filtered['Price'].min()
-            meds = df_filtered[df_filtered['Price'] == min_price]
-            meds_list = ', '.join(
-                set(meds['Generic Name'].fillna('')) |
-                set(meds['Brand Name'].fillna('')))
-            return f"The cheapest medicine(s) for your query: {meds_list} at ₹{min_price}"
+            # "top 5 cheapest ..." / "cheapest 3 ..." ranks equivalents instead of only the minimum
+            top_match = re.search(r'\b(?:top|cheapest)\s+(\d+)\b', user_query.lower())
+            top_n = int(top_match.group(1)) if top_match else 1
+            cheapest = self.price_index.cheapest(matched_generic, matched_brand, top_n=top_n,
+                                                 equivalents=top_n > 1)
+            if not cheapest:
+                return result("Sorry, no matching price information found.")
+            if top_n > 1:
+                ranked = '\n'.join(
+                    f"{rank}. {self.df['Brand Name'].iat[row] or self.df['Generic Name'].iat[row]} "
+                    f"({self.df['Salt'].iat[row]}) at ₹{price}"
+                    for rank, (price, row) in enumerate(cheapest, start=1))
+                return result(f"The {len(cheapest)} cheapest medicine(s) for your query:\n{ranked}")
+            min_price = cheapest[0][0]
+            names = []
+            for _, row in cheapest:
+                names.extend([self.df['Generic Name'].iat[row], self.df['Brand Name'].iat[row]])
+            meds_list = ', '.join(name for name in dict.fromkeys(names) if name)
+            return result(f"The cheapest medicine(s) for your query: {meds_list} at ₹{min_price}")
 
-        matched_generic, matched_brand = self._extract_medicine_types(user_query)
         intro_notes = ""
         if matched_generic or matched_brand:
             parts = []
@@ -168,9 +253,8 @@ class RAGPipeline:
             if matched_brand:
                 parts.append(f"brand name(s): {', '.join(matched_brand)}")
             salts_info = []
-            for brand in matched_brand:
-                salts = self.df[self.df['Brand Name'] == brand]['Salt'].dropna().unique()
-                if len(salts) > 0:
+            for brand, salts in self.brand_salts(matched_brand).items():
+                if salts:
                     salts_info.append(f"Brand '{brand}' contains salt(s): {', '.join(salts)}")
                 else:
                     salts_info.append(f"Brand '{brand}' has no salt information available.")
@@ -206,15 +290,14 @@ User's Question:
 
 Answer:"""
 
-        # Call Groq API
-        try:
-            result = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.7,
-                max_tokens=500,
-                top_p=0.9
-            )
-            return result.choices[0].message.content.strip()
-        except Exception as e:
-            return f"Sorry, an error occurred during Groq API generation: {e}"
+        return result(prompt=prompt, context_text=context_text)
+
+    def _retrieval(self, answer=None, prompt=None, context=None, generics=(), brands=()):
+        return {
+            'answer': answer,
+            'prompt': prompt,
+            'context': context,
+            'generics': list(generics),
+            'brands': list(brands),
+            'salts': self.brand_salts(brands) if brands else {}
+        }
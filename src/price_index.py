@@ -0,0 +1,84 @@
+import heapq
+import math
+from itertools import islice
+from src.recommender_engine import normalize_salt
+
+
+class PriceIndex:
+    """
+    Precomputed price tables over the catalogue.
+
+    Rows are grouped by generic name, brand name and normalized salt set, each group kept
+    sorted by price. "Cheapest X" questions become dictionary lookups plus a lazy merge of
+    presorted lists that stops after the rows it needs.
+    """
+    def __init__(self, data_df):
+        self.df = data_df
+        prices = data_df['price_value'].to_numpy(dtype='float64')
+        self.prices = prices
+
+        self.by_generic = {}
+        self.by_brand = {}
+        self.by_salt = {}
+        self.row_salts = []
+        columns = zip(data_df['Generic Name'], data_df['Brand Name'], data_df['Salt'])
+        for row, (generic, brand, salt) in enumerate(columns):
+            salts = normalize_salt(salt) if isinstance(salt, str) and salt else frozenset()
+            self.row_salts.append(salts)
+            if math.isnan(prices[row]):
+                continue
+            if generic:
+                self.by_generic.setdefault(generic, []).append(row)
+            if brand:
+                self.by_brand.setdefault(brand, []).append(row)
+            if salts:
+                self.by_salt.setdefault(salts, []).append(row)
+
+        by_price = lambda row: prices[row]
+        for table in (self.by_generic, self.by_brand, self.by_salt):
+            for rows in table.values():
+                rows.sort(key=by_price)
+        self.all_rows = sorted((row for row in range(len(prices)) if not math.isnan(prices[row])), key=by_price)
+
+    def ranked(self, generics=(), brands=(), equivalents=False):
+        """
+        Yields (price, row) in ascending price order, without duplicates.
+
+        Args:
+            generics (list): Generic names to include. If both this and brands are empty,
+                the whole catalogue is ranked.
+            brands (list): Brand names to include.
+            equivalents (bool): Also include rows sharing a salt set with any matched brand.
+        """
+        groups = [self.by_generic.get(g, []) for g in generics] + [self.by_brand.get(b, []) for b in brands]
+        if equivalents:
+            for brand in brands:
+                for row in self.by_brand.get(brand, [])[:1]:
+                    groups.append(self.by_salt.get(self.row_salts[row], []))
+        if not generics and not brands:
+            groups = [self.all_rows]
+
+        seen = set()
+        # Lazy (price, row) views over the presorted groups: only the rows consumed are visited
+        merged = heapq.merge(*(zip(map(self.prices.__getitem__, rows), rows) for rows in groups))
+        for price, row in merged:
+            if row not in seen:
+                seen.add(row)
+                yield price, row
+
+    def cheapest(self, generics=(), brands=(), top_n=1, equivalents=False):
+        """
+        Returns the cheapest rows for the given names.
+
+        With top_n=1 every row tied at the minimum price is returned; otherwise the top_n
+        cheapest rows are returned in ascending price order.
+        """
+        ranked = self.ranked(generics, brands, equivalents)
+        if top_n != 1:
+            return list(islice(ranked, top_n))
+        results = []
+        for price, row in ranked:
+            if results and price > results[0][0]:
+                break
+            results.append((price, row))
+        return results
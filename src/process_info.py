@@ -0,0 +1,30 @@
+import os
+import resource
+
+
+def memory_usage(pid='self'):
+    """
+    Memory of a process in MB.
+
+    On Linux this reads /proc/<pid>/smaps_rollup: 'pss' charges shared pages
+    proportionally, so the PSS of all workers adds up to their real footprint, and
+    'private' is what the process alone holds (pages it has written since fork).
+    Elsewhere only the peak RSS of the current process is available.
+    """
+    fields = {'Rss': 'rss_mb', 'Pss': 'pss_mb', 'Private_Clean': 'private_mb', 'Private_Dirty': 'private_mb',
+              'Shared_Clean': 'shared_mb', 'Shared_Dirty': 'shared_mb'}
+    usage = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                name, _, rest = line.partition(':')
+                if name in fields:
+                    kb = int(rest.split()[0])
+                    usage[fields[name]] = usage.get(fields[name], 0) + kb / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    if not usage and pid == 'self':
+        # ru_maxrss is in KB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        usage['peak_rss_mb'] = peak / (1024 * 1024) if os.uname().sysname == 'Darwin' else peak / 1024
+    return {name: round(value, 1) for name, value in usage.items()}
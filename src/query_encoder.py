@@ -0,0 +1,137 @@
+import threading
+from collections import OrderedDict
+
+
+class _PendingQuery:
+    __slots__ = ('text', 'event', 'vector', 'error')
+
+    def __init__(self, text):
+        self.text = text
+        self.event = threading.Event()
+        self.vector = None
+        self.error = None
+
+
+class QueryEncoder:
+    """
+    Caching, micro-batching front end for SentenceTransformer.encode on single queries.
+
+    Query embeddings are kept in an LRU cache keyed on normalized query text. Cache misses
+    that arrive from concurrent threads within `batch_window_ms` of each other are encoded
+    together in one forward pass: the first caller waits out the window, encodes the whole
+    batch and hands each waiting thread its vector.
+    """
+    def __init__(self, model, cache_size=1024, batch_window_ms=5, max_batch_size=32):
+        self.model = model
+        self.cache_size = cache_size
+        self.batch_window_ms = batch_window_ms
+        self.max_batch_size = max_batch_size
+
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+        self._pending = []
+        self._batch_lock = threading.Lock()
+        self._batch_full = threading.Event()
+
+        self.hits = 0
+        self.misses = 0
+        self.batches = 0
+        self.batched_queries = 0
+
+    @staticmethod
+    def normalize(query):
+        return ' '.join(query.lower().split())
+
+    def encode(self, query):
+        """
+        Returns the embedding vector (1-D) for a single query.
+
+        Args:
+            query (str): The query text.
+
+        Returns:
+            np.ndarray: The embedding of the normalized query.
+        """
+        key = self.normalize(query)
+        with self._cache_lock:
+            vector = self._cache.get(key)
+            if vector is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return vector
+            self.misses += 1
+
+        if self.batch_window_ms and self.batch_window_ms > 0:
+            vector = self._encode_batched(key)
+        else:
+            vector = self.model.encode([key])[0]
+            with self._cache_lock:
+                self.batches += 1
+                self.batched_queries += 1
+
+        if self.cache_size:
+            with self._cache_lock:
+                self._cache[key] = vector
+                self._cache.move_to_end(key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return vector
+
+    def _encode_batched(self, key):
+        pending = _PendingQuery(key)
+        with self._batch_lock:
+            self._pending.append(pending)
+            is_leader = len(self._pending) == 1
+            if len(self._pending) >= self.max_batch_size:
+                self._batch_full.set()
+
+        if not is_leader:
+            pending.event.wait()
+        else:
+            # Collect whatever else arrives during the window (or until the batch fills up)
+            self._batch_full.wait(self.batch_window_ms / 1000.0)
+            with self._batch_lock:
+                batch, self._pending = self._pending, []
+                self._batch_full.clear()
+            self._run_batch(batch)
+
+        if pending.error is not None:
+            raise pending.error
+        return pending.vector
+
+    def _run_batch(self, batch):
+        # Identical concurrent queries share one row of the forward pass
+        texts = list(OrderedDict.fromkeys(p.text for p in batch))
+        try:
+            vectors = self.model.encode(texts)
+            by_text = dict(zip(texts, vectors))
+            for p in batch:
+                p.vector = by_text[p.text]
+        except Exception as e:
+            for p in batch:
+                p.error = e
+        finally:
+            with self._cache_lock:
+                self.batches += 1
+                self.batched_queries += len(batch)
+            for p in batch:
+                p.event.set()
+
+    def stats(self):
+        with self._cache_lock:
+            lookups = self.hits + self.misses
+            return {
+                'cache_size': len(self._cache),
+                'cache_capacity': self.cache_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'batch_window_ms': self.batch_window_ms,
+                'batches': self.batches,
+                'avg_batch_size': self.batched_queries / self.batches if self.batches else 0.0,
+            }
+
+    def clear(self):
+        with self._cache_lock:
+            self._cache.clear()
@@ -0,0 +1,244 @@
+from abc import ABC, abstractmethod
+import threading
+import time
+
+from src.cache_backends import SQLiteConnections
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+def _refill(level, updated_at, now, capacity, rate):
+    if level is None:
+        return capacity
+    return min(capacity, level + max(0.0, now - updated_at) * rate)
+
+
+class BucketStore(ABC):
+    """
+    Holds token-bucket levels. take() is atomic across every bucket passed to it: either
+    all of them are debited, or none are and the seconds until they could be is returned.
+
+    Each bucket is (key, capacity, refill_rate_per_second, cost).
+    """
+    name = 'base'
+
+    @abstractmethod
+    def take(self, buckets, now=None):
+        pass
+
+
+class MemoryBucketStore(BucketStore):
+    """Buckets in this process only. Every gunicorn worker gets its own budget."""
+    name = 'memory'
+
+    def __init__(self):
+        self.levels = {}  # key -> (level, updated_at)
+        self.lock = threading.Lock()
+
+    def take(self, buckets, now=None):
+        now = now or time.time()
+        with self.lock:
+            levels, wait = [], 0.0
+            for key, capacity, rate, cost in buckets:
+                level = _refill(*self.levels.get(key, (None, now)), now, capacity, rate)
+                levels.append(level)
+                if level < cost:
+                    wait = max(wait, (cost - level) / rate)
+            if wait > 0:
+                return wait
+            for (key, _, _, cost), level in zip(buckets, levels):
+                self.levels[key] = (level - cost, now)
+            return 0.0
+
+
+class SQLiteBucketStore(SQLiteConnections, BucketStore):
+    """
+    Buckets in a SQLite file shared by every worker on the host. Each take() runs in a
+    BEGIN IMMEDIATE transaction, so the read-refill-debit is serialized across processes.
+    """
+    name = 'sqlite'
+
+    def __init__(self, path):
+        self._open_connections(path)
+        self._conn().execute("""
+            CREATE TABLE IF NOT EXISTS rate_buckets (
+                key TEXT PRIMARY KEY,
+                level REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+
+    def take(self, buckets, now=None):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = now or time.time()
+            levels, wait = [], 0.0
+            for key, capacity, rate, cost in buckets:
+                row = conn.execute("SELECT level, updated_at FROM rate_buckets WHERE key = ?", (key,)).fetchone()
+                level = _refill(*(row or (None, now)), now, capacity, rate)
+                levels.append(level)
+                if level < cost:
+                    wait = max(wait, (cost - level) / rate)
+            if wait <= 0:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO rate_buckets (key, level, updated_at) VALUES (?, ?, ?)",
+                    [(key, level - cost, now) for (key, _, _, cost), level in zip(buckets, levels)]
+                )
+            conn.execute("COMMIT")
+            return wait
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+# KEYS = bucket keys; ARGV = now, then (capacity, rate, cost) per key. Returns the wait as a
+# string, since Redis truncates Lua numbers to integers.
+_TAKE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local levels = {}
+local wait = 0
+for i = 1, #KEYS do
+  local capacity = tonumber(ARGV[i * 3 - 1])
+  local rate = tonumber(ARGV[i * 3])
+  local cost = tonumber(ARGV[i * 3 + 1])
+  local state = redis.call('HMGET', KEYS[i], 'level', 'ts')
+  local level = capacity
+  if state[1] then
+    level = math.min(capacity, tonumber(state[1]) + math.max(0, now - tonumber(state[2])) * rate)
+  end
+  levels[i] = level
+  if level < cost then
+    wait = math.max(wait, (cost - level) / rate)
+  end
+end
+if wait > 0 then
+  return tostring(wait)
+end
+for i = 1, #KEYS do
+  local capacity = tonumber(ARGV[i * 3 - 1])
+  local rate = tonumber(ARGV[i * 3])
+  local cost = tonumber(ARGV[i * 3 + 1])
+  redis.call('HSET', KEYS[i], 'level', levels[i] - cost, 'ts', now)
+  redis.call('EXPIRE', KEYS[i], math.ceil(capacity / rate) + 60)
+end
+return '0'
+"""
+
+
+class RedisBucketStore(BucketStore):
+    """
+    Buckets on a Redis-protocol server, shared across workers and hosts. The refill and
+    debit run in one Lua script, so concurrent callers can't overdraw a bucket.
+    """
+    name = 'redis'
+
+    def __init__(self, url=None, client=None, prefix='medicare:ratelimit:'):
+        if client is None:
+            if redis is None:
+                raise ImportError("The 'redis' package is required for the Redis rate limit backend.")
+            client = redis.Redis.from_url(url or 'redis://localhost:6379/0', socket_timeout=2)
+        self.client = client
+        self.prefix = prefix
+        self._script = client.register_script(_TAKE_SCRIPT)
+
+    def take(self, buckets, now=None):
+        args = [now or time.time()]
+        for _, capacity, rate, cost in buckets:
+            args.extend([capacity, rate, cost])
+        wait = self._script(keys=[self.prefix + key for key, _, _, _ in buckets], args=args)
+        return float(wait.decode('utf-8') if isinstance(wait, bytes) else wait)
+
+
+class TokenBucketLimiter:
+    """
+    Rate limiter for one provider quota: a requests-per-minute bucket and, optionally, a
+    tokens-per-minute bucket, both refilled continuously. With a shared store every worker
+    draws from the same buckets, so the quota holds for the whole deployment.
+    """
+    def __init__(self, name, requests_per_minute, tokens_per_minute=None, store=None):
+        self.name = name
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.store = store or MemoryBucketStore()
+        self.lock = threading.Lock()
+        self.granted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+
+    def _buckets(self, tokens):
+        buckets = [(f"{self.name}:requests", self.requests_per_minute, self.requests_per_minute / 60.0, 1)]
+        if self.tokens_per_minute and tokens:
+            # A single oversized request still has to fit in the bucket eventually
+            cost = min(tokens, self.tokens_per_minute)
+            buckets.append((f"{self.name}:tokens", self.tokens_per_minute, self.tokens_per_minute / 60.0, cost))
+        return buckets
+
+    def acquire(self, tokens=0, max_wait=0):
+        """
+        Takes one request (and `tokens` tokens) from the budget.
+
+        Args:
+            tokens (int): Estimated tokens the request will use.
+            max_wait (float): Seconds the caller is willing to queue for budget. If the
+                budget can't be met within this, returns False straight away.
+
+        Returns:
+            bool: True if the request may proceed.
+        """
+        buckets = self._buckets(tokens)
+        deadline = time.time() + max_wait
+        waited = 0.0
+        while True:
+            wait = self.store.take(buckets)
+            if wait <= 0:
+                with self.lock:
+                    self.granted += 1
+                    if waited:
+                        self.queued += 1
+                        self.total_wait += waited
+                return True
+            remaining = deadline - time.time()
+            if wait > remaining:
+                with self.lock:
+                    self.rejected += 1
+                return False
+            # Other workers may take the refill first, so re-check after sleeping
+            time.sleep(wait)
+            waited += wait
+
+    def can_make_request(self):
+        return self.acquire()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'backend': self.store.name,
+                'requests_per_minute': self.requests_per_minute,
+                'tokens_per_minute': self.tokens_per_minute,
+                'granted': self.granted,
+                'queued': self.queued,
+                'rejected': self.rejected,
+                'avg_queue_wait': self.total_wait / self.queued if self.queued else 0.0
+            }
+
+
+def create_bucket_store(kind='memory', **options):
+    """
+    Builds a bucket store by name.
+
+    Args:
+        kind (str): 'memory', 'sqlite' or 'redis'.
+        **options: path (sqlite), url (redis).
+    """
+    if kind == 'memory':
+        return MemoryBucketStore()
+    if kind == 'sqlite':
+        return SQLiteBucketStore(options.get('path', 'data/cache/rate_limits.sqlite3'))
+    if kind == 'redis':
+        return RedisBucketStore(url=options.get('url'))
+    raise ValueError(f"Unknown rate limit backend '{kind}'. Expected 'memory', 'sqlite' or 'redis'.")
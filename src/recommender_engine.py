@@ -1,4 +1,52 @@
+import bisect
+import re
 import pandas as pd
+from src.data_processor import parse_prices
+
+
+def normalize_salt(composition):
+    """
+    Normalizes a composition string into a set of salts, ignoring order, case and spacing.
+    e.g. "Paracetamol (500mg) + Caffeine (30mg)" -> {"caffeine (30mg)", "paracetamol (500mg)"}
+    """
+    parts = re.split(r'\s*\+\s*', str(composition).lower())
+    return frozenset(' '.join(p.split()) for p in parts if p.strip())
+
+
+class PrefixIndex:
+    """
+    Sorted list of brand-name suffixes, one starting at every word of a name, so a partial
+    name like "dolo" or "650" finds "Dolo 650" with a binary search instead of a scan of
+    the whole column. Flat lists of strings keep it small next to the catalogue itself.
+    """
+    def __init__(self):
+        self._pending = []  # (suffix, row) added since the last build()
+        self._keys = []
+        self._rows = []
+
+    def add(self, name, row):
+        name = ' '.join(str(name).lower().split())
+        starts = [0] + [m.end() for m in re.finditer(r' ', name)]
+        self._pending.extend((name[start:], row) for start in starts)
+
+    def build(self):
+        """Sorts added names into the index; called once after the last add()"""
+        entries = sorted(list(zip(self._keys, self._rows)) + self._pending)
+        self._keys = [suffix for suffix, _ in entries]
+        self._rows = [row for _, row in entries]
+        self._pending = []
+
+    def search(self, prefix):
+        """Returns the set of rows with a name (or a word in it) starting with prefix."""
+        if self._pending:
+            self.build()
+        prefix = ' '.join(prefix.lower().split())
+        if not prefix:
+            return set()
+        lo = bisect.bisect_left(self._keys, prefix)
+        hi = bisect.bisect_left(self._keys, prefix + chr(0x10FFFF), lo)
+        return set(self._rows[lo:hi])
+
 
 class RecommenderEngine:
     """
@@ -7,33 +55,69 @@ class RecommenderEngine:
     """
     def __init__(self, data_df):
         self.df = data_df
+        self._build_indexes()
+
+    def _build_indexes(self):
+        # Built once; every lookup afterwards is a dictionary lookup or binary search
+        self.brand_index = {}
+        self.salt_index = {}
+        self.prefix_index = PrefixIndex()
+        self.row_salts = []
+        for row, (brand, salt) in enumerate(zip(self.df['Brand Name'], self.df['Salt'])):
+            salts = normalize_salt(salt) if pd.notna(salt) else frozenset()
+            self.row_salts.append(salts)
+            if salts:
+                self.salt_index.setdefault(salts, []).append(row)
+            if pd.notna(brand) and str(brand):
+                self.brand_index.setdefault(str(brand).lower(), []).append(row)
+                self.prefix_index.add(brand, row)
+
+        self.prefix_index.build()
 
-    def find_alternatives(self, drug_name):
+        prices = self.df['price_value'] if 'price_value' in self.df.columns else parse_prices(self.df['Price'])
+        self.prices = prices.to_numpy(dtype='float64')
+
+    def _find_rows(self, drug_name):
+        rows = self.brand_index.get(drug_name.lower())
+        if rows:
+            return rows
+        rows = self.prefix_index.search(drug_name)
+        if rows:
+            return sorted(rows)
+        # Mid-word fragments aren't in the prefix index; keep the old substring behaviour for those
+        mask = self.df['Brand Name'].str.contains(drug_name, case=False, na=False, regex=False)
+        return mask.to_numpy().nonzero()[0].tolist()
+
+    def find_alternatives(self, drug_name, top_n=None):
         """
         Finds equivalent drugs based on a given brand name's composition.
-        
+
         Args:
             drug_name (str): The name of the drug to find alternatives for.
-        
+            top_n (int): If given, only the top_n cheapest alternatives are returned.
+
         Returns:
-            tuple: A tuple containing a DataFrame of alternatives and a status message.
+            tuple: A tuple containing a DataFrame of alternatives (cheapest first) and a status message.
         """
         # Find the row for the requested drug
-        drug_row = self.df[self.df['Brand Name'].str.contains(drug_name, case=False, na=False)]
-        
-        if drug_row.empty:
+        rows = self._find_rows(drug_name)
+        if not rows:
             return None, "Drug not found in database."
 
         # Get the composition (Salt) of the drug
-        composition = drug_row['Salt'].iloc[0]
+        salts = self.row_salts[rows[0]]
 
         # Find all other drugs with the same composition
-        alternatives = self.df[
-            (self.df['Salt'].str.contains(composition, case=False, na=False)) &
-            (self.df['Brand Name'].str.lower() != drug_name.lower())
+        drug_lower = drug_name.lower()
+        alternatives = [
+            row for row in self.salt_index.get(salts, [])
+            if str(self.df['Brand Name'].iat[row]).lower() != drug_lower
         ]
-        
-        if alternatives.empty:
+        if not alternatives:
             return None, "No generic alternatives found for this drug."
 
-        return alternatives, "Alternatives found."
+        # Unknown prices sort last
+        alternatives.sort(key=lambda row: (pd.isna(self.prices[row]), self.prices[row]))
+        if top_n is not None:
+            alternatives = alternatives[:top_n]
+        return self.df.iloc[alternatives], "Alternatives found."
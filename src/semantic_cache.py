@@ -0,0 +1,159 @@
+import threading
+import time
+from collections import OrderedDict, deque
+
+# Thresholds we report "would have hit" rates for, to tune the live threshold safely
+DEFAULT_REPORT_THRESHOLDS = (0.80, 0.85, 0.90, 0.92, 0.95, 0.97, 0.99)
+
+
+class _Scope:
+    """Answered queries for one cache scope (PDF context / model / prompt variant)."""
+    def __init__(self, dim):
+        import faiss
+        self.index = faiss.IndexFlatIP(dim)
+        self.entries = deque()  # (query, response, created_at, vector), oldest first
+
+
+class SemanticCache:
+    """
+    Response cache keyed by query embeddings.
+
+    Each scope keeps the normalized embeddings of answered queries in a small inner-product
+    FAISS index, so a lookup is one cosine-similarity search. A cached answer is served when
+    the best match is at or above `threshold`. In 'shadow' mode lookups are only measured,
+    never served, which lets the per-threshold hit rates be checked before switching it on.
+
+    At most max_scopes scopes are kept, least recently used dropped first, and a scope is
+    dropped as soon as all its entries have expired.
+    """
+    def __init__(self, encoder=None, threshold=0.95, mode='shadow', max_entries_per_scope=500,
+                 ttl=3600, report_thresholds=DEFAULT_REPORT_THRESHOLDS, max_scopes=256, search_k=8):
+        self.encoder = encoder
+        self.threshold = threshold
+        self.mode = mode
+        self.max_entries_per_scope = max_entries_per_scope
+        self.ttl = ttl
+        self.max_scopes = max_scopes
+        self.search_k = search_k
+        self.report_thresholds = tuple(sorted(set(report_thresholds) | {threshold}))
+
+        self._scopes = OrderedDict()
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self._would_hit = {t: 0 for t in self.report_thresholds}
+
+    @property
+    def enabled(self):
+        return self.encoder is not None and self.mode in ('on', 'shadow')
+
+    def _embed(self, query):
+        # faiss and numpy are loaded with the encoder, so importing them here costs nothing extra
+        import faiss
+        import numpy as np
+        vector = np.asarray(self.encoder.encode(query), dtype='float32').reshape(1, -1).copy()
+        faiss.normalize_L2(vector)
+        return vector
+
+    def _expired(self, created_at, now):
+        return bool(self.ttl) and created_at + self.ttl <= now
+
+    def get(self, query, scope=''):
+        """
+        Returns (response, similarity) for the closest unexpired answered query in scope, or
+        None. In shadow mode this always returns None but still records the similarity.
+        """
+        if not self.enabled:
+            return None
+        vector = self._embed(query)
+        with self._lock:
+            self.lookups += 1
+            entry = self._scopes.get(scope)
+            if entry is None or entry.index.ntotal == 0:
+                return None
+            self._scopes.move_to_end(scope)
+            # Several neighbours, so an expired nearest entry doesn't hide a live one behind it
+            sims, ids = entry.index.search(vector, min(self.search_k, entry.index.ntotal))
+            now = time.time()
+            match, expired = None, False
+            for similarity, pos in zip(sims[0], ids[0]):
+                if pos < 0:
+                    break
+                _, response, created_at, _ = entry.entries[int(pos)]
+                if self._expired(created_at, now):
+                    expired = True
+                    continue
+                match = (response, float(similarity))
+                break
+            if expired:
+                self._rebuild(scope, entry, now)
+            if match is None:
+                return None
+            response, similarity = match
+            for t in self.report_thresholds:
+                if similarity >= t:
+                    self._would_hit[t] += 1
+            if self.mode != 'on' or similarity < self.threshold:
+                return None
+            self.hits += 1
+            return response, similarity
+
+    def set(self, query, response, scope=''):
+        if not self.enabled:
+            return
+        vector = self._embed(query)
+        with self._lock:
+            entry = self._scopes.get(scope)
+            if entry is None:
+                entry = self._scopes[scope] = _Scope(vector.shape[1])
+                self._evict_scopes()
+            self._scopes.move_to_end(scope)
+            entry.entries.append((query, response, time.time(), vector))
+            entry.index.add(vector)
+            if len(entry.entries) > self.max_entries_per_scope:
+                # Drop the oldest ~10% too, so the index is rebuilt rarely
+                self._rebuild(scope, entry, time.time(), keep=int(self.max_entries_per_scope * 0.9))
+
+    def _evict_scopes(self):
+        # Least recently used first; an idle scope whose newest entry has expired goes as well
+        now = time.time()
+        while self._scopes:
+            scope, entry = next(iter(self._scopes.items()))
+            if len(self._scopes) <= self.max_scopes and not (entry.entries and self._expired(entry.entries[-1][2], now)):
+                break
+            del self._scopes[scope]
+
+    def _rebuild(self, scope, entry, now, keep=None):
+        """Rebuilds a scope's index without expired entries (and beyond the newest keep); drops it if empty"""
+        import numpy as np
+        live = [e for e in entry.entries if not self._expired(e[2], now)]
+        if keep is not None:
+            live = live[-keep:]
+        if not live:
+            del self._scopes[scope]
+            return
+        entry.entries = deque(live)
+        entry.index.reset()
+        entry.index.add(np.vstack([e[3] for e in live]))
+
+    def clear(self):
+        with self._lock:
+            self._scopes.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.lookups
+            return {
+                'mode': self.mode,
+                'enabled': self.enabled,
+                'threshold': self.threshold,
+                'scopes': len(self._scopes),
+                'entries': sum(len(s.entries) for s in self._scopes.values()),
+                'lookups': lookups,
+                'hits': self.hits,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'hit_rate_by_threshold': {
+                    f"{t:.2f}": self._would_hit[t] / lookups if lookups else 0.0
+                    for t in self.report_thresholds
+                }
+            }
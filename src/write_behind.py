@@ -0,0 +1,236 @@
+import os
+import threading
+import time
+from collections import deque
+
+
+class WriteBehindQueue:
+    """
+    Buffers rows in memory and writes them in batches from a background thread.
+
+    submit() only appends to the queue, so the caller never waits on the database. The
+    flusher thread hands write_batch() up to batch_size rows at a time, as soon as a full
+    batch is queued or flush_interval seconds after the oldest queued row. A failed batch
+    stays at the front of the queue and is retried with backoff, up to max_attempts times.
+    After that its rows are written one at a time, and any row that still fails is handed to
+    dead_letter(row, error) and dropped, so one bad row can't hold up the rows behind it.
+
+    The queue holds at most max_size rows. When it is full, submit() blocks for up to
+    max_wait seconds for room (backpressure) and then gives up, so the caller can write the
+    row itself.
+    """
+    def __init__(self, write_batch, batch_size=100, flush_interval=0.2, max_size=5000,
+                 max_wait=2.0, max_attempts=3, dead_letter=None, name='write-behind', logger=None):
+        self.write_batch = write_batch
+        self.max_attempts = max_attempts
+        self.dead_letter = dead_letter
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self.name = name
+        self.logger = logger
+        self.submitted = 0
+        self.written = 0
+        self.batches = 0
+        self.failures = 0
+        self.dead_lettered = 0
+        self.backpressure_waits = 0
+        self.rejected = 0
+        self.max_depth = 0
+        self._reset()
+        # The flusher thread doesn't survive a fork; each worker starts its own
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._cond = threading.Condition()
+        self._queue = deque()  # (enqueued_at, row)
+        self._inflight = []
+        self._thread = None
+        self._closed = False
+        self._flush_requested = False
+
+    def _log(self, level, message):
+        if self.logger:
+            getattr(self.logger, level)(message)
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def submit(self, row):
+        """
+        Queues a row for writing.
+
+        Returns:
+            bool: False if the queue is closed, or still full after max_wait seconds; the
+                row was not queued.
+        """
+        with self._cond:
+            if self._closed:
+                return False
+            if len(self._queue) >= self.max_size:
+                self.backpressure_waits += 1
+                self._flush_requested = True
+                self._cond.notify_all()
+                deadline = time.monotonic() + self.max_wait
+                while len(self._queue) >= self.max_size and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.rejected += 1
+                        return False
+                    self._cond.wait(remaining)
+                if self._closed:
+                    return False
+            self._ensure_thread()
+            self._queue.append((time.monotonic(), row))
+            self.submitted += 1
+            self.max_depth = max(self.max_depth, len(self._queue))
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify_all()
+            return True
+
+    def _next_batch(self):
+        """Waits for a batch to be due and takes it off the queue. Returns None once closed and drained."""
+        with self._cond:
+            while True:
+                if self._queue:
+                    due = self._queue[0][0] + self.flush_interval
+                    if (len(self._queue) >= self.batch_size or self._flush_requested or self._closed
+                            or time.monotonic() >= due):
+                        break
+                    self._cond.wait(max(0.0, due - time.monotonic()))
+                elif self._closed:
+                    return None
+                else:
+                    self._flush_requested = False
+                    self._cond.wait()
+            count = min(self.batch_size, len(self._queue))
+            self._inflight = [self._queue.popleft() for _ in range(count)]
+            if not self._queue:
+                self._flush_requested = False
+            self._cond.notify_all()
+            return [row for _, row in self._inflight]
+
+    def _run(self):
+        attempts = 0
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            try:
+                self.write_batch(batch)
+                written = len(batch)
+            except Exception as e:
+                attempts += 1
+                self._log('error', f"{self.name}: writing {len(batch)} rows failed, attempt {attempts} ({e})")
+                if attempts < self.max_attempts:
+                    self._retry_later(min(30.0, 0.5 * 2 ** (attempts - 1)))
+                    continue
+                written = self._write_rows(batch)
+            attempts = 0
+            with self._cond:
+                self.written += written
+                self.batches += 1
+                self._inflight = []
+                self._cond.notify_all()
+
+    def _retry_later(self, delay):
+        """Puts the in-flight batch back in front of the queue and waits out the backoff"""
+        with self._cond:
+            self.failures += 1
+            self._queue.extendleft(reversed(self._inflight))
+            self._inflight = []
+            self._cond.notify_all()
+            # close() cuts the backoff short, so shutdown doesn't wait on it
+            deadline = time.monotonic() + delay
+            while not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+    def _write_rows(self, rows):
+        """Writes rows one at a time, dead-lettering those that fail. Returns the number written."""
+        written = 0
+        for row in rows:
+            try:
+                self.write_batch([row])
+                written += 1
+            except Exception as e:
+                with self._cond:
+                    self.dead_lettered += 1
+                self._log('error', f"{self.name}: dropping a row that can't be written ({e})")
+                if self.dead_letter:
+                    try:
+                        self.dead_letter(row, e)
+                    except Exception as dead_letter_error:
+                        self._log('error', f"{self.name}: dead letter failed ({dead_letter_error})")
+        return written
+
+    def pending(self, predicate=None):
+        """Rows queued or being written that match predicate, oldest first"""
+        with self._cond:
+            rows = [row for _, row in self._inflight] + [row for _, row in self._queue]
+        return [row for row in rows if predicate is None or predicate(row)]
+
+    def flush(self, predicate=None, timeout=5.0):
+        """
+        Writes out queued rows now and waits until none matching predicate (or none at all)
+        are left.
+
+        Returns:
+            bool: True if they were all written within timeout.
+        """
+        def outstanding():
+            rows = [row for _, row in self._inflight] + [row for _, row in self._queue]
+            return any(predicate is None or predicate(row) for row in rows)
+
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            if not outstanding():
+                return True
+            self._ensure_thread()
+            self._flush_requested = True
+            self._cond.notify_all()
+            while outstanding():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def close(self, timeout=10.0):
+        """Stops taking rows, writes out what is queued and stops the flusher thread"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+            left = len(self._queue) + len(self._inflight)
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
+        with self._cond:
+            unwritten = len(self._queue) + len(self._inflight)
+        if unwritten:
+            self._log('error', f"{self.name}: {unwritten} rows not written at shutdown")
+        elif left:
+            self._log('info', f"{self.name}: flushed {left} rows at shutdown")
+        return unwritten == 0
+
+    def stats(self):
+        with self._cond:
+            return {
+                'queued': len(self._queue),
+                'in_flight': len(self._inflight),
+                'max_depth': self.max_depth,
+                'max_size': self.max_size,
+                'submitted': self.submitted,
+                'written': self.written,
+                'batches': self.batches,
+                'avg_batch_size': self.written / self.batches if self.batches else 0.0,
+                'failures': self.failures,
+                'dead_lettered': self.dead_lettered,
+                'backpressure_waits': self.backpressure_waits,
+                'rejected': self.rejected
+            }
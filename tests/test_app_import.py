@@ -0,0 +1,18 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+for _module in ('flask', 'flask_cors', 'mysql.connector', 'werkzeug'):
+    pytest.importorskip(_module)
+
+
+def test_app_imports(monkeypatch):
+    """Importing app must not depend on a database, API keys or model files"""
+    monkeypatch.chdir(ROOT)
+    app = importlib.import_module('app')
+    assert app.api_manager.get_provider('groq')['rate_limiter'].store is app.rate_limit_store
@@ -0,0 +1,34 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+fakeredis = pytest.importorskip('fakeredis')
+
+from src.cache_backends import RedisBackend
+
+
+@pytest.fixture
+def backend():
+    return RedisBackend(client=fakeredis.FakeRedis(), prefix='test:response:')
+
+
+def test_redis_backend_round_trip(backend):
+    assert backend.get('missing') is None
+    backend.set('key', 'answer ✓', ttl=60)
+    assert backend.get('key') == 'answer ✓'
+    assert 0 < backend.client.ttl('test:response:key') <= 60
+    backend.delete('key')
+    assert backend.get('key') is None
+
+
+def test_redis_backend_clear_only_touches_its_prefix(backend):
+    backend.client.set('other:key', 'kept')
+    backend.set('a', '1')
+    backend.set('b', '2', ttl=30)
+    backend.clear()
+    assert backend.get('a') is None and backend.get('b') is None
+    assert backend.client.get('other:key') == b'kept'
@@ -0,0 +1,140 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.write_behind import WriteBehindQueue
+
+
+class FakeWriter:
+    """write_batch stand-in that records each call and can block or fail on demand"""
+    def __init__(self, fail=None, block=False):
+        self.calls = []
+        self.fail = fail or (lambda batch, attempt: False)
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        if not block:
+            self.release.set()
+
+    def __call__(self, batch):
+        self.calls.append((time.monotonic(), list(batch)))
+        self.entered.set()
+        self.release.wait(5)
+        if self.fail(batch, len(self.calls)):
+            raise RuntimeError(f"cannot write {batch}")
+
+    @property
+    def batches(self):
+        return [batch for _, batch in self.calls]
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+@pytest.fixture
+def queues():
+    created = []
+    yield created
+    for queue in created:
+        queue.close(timeout=2)
+
+
+def make_queue(queues, writer, **options):
+    queue = WriteBehindQueue(writer, **options)
+    queues.append(queue)
+    return queue
+
+
+def test_full_batches_are_written_without_waiting_for_the_interval(queues):
+    writer = FakeWriter()
+    queue = make_queue(queues, writer, batch_size=3, flush_interval=10)
+    for row in range(7):
+        assert queue.submit(row)
+    assert wait_for(lambda: queue.stats()['written'] == 6)
+    assert writer.batches == [[0, 1, 2], [3, 4, 5]]
+    assert queue.pending() == [6]
+
+
+def test_partial_batch_is_written_after_the_flush_interval(queues):
+    writer = FakeWriter()
+    queue = make_queue(queues, writer, batch_size=100, flush_interval=0.1)
+    submitted = time.monotonic()
+    queue.submit('a')
+    queue.submit('b')
+    assert wait_for(lambda: writer.calls)
+    written_at, batch = writer.calls[0]
+    assert batch == ['a', 'b']
+    assert written_at - submitted >= 0.09
+
+
+def test_flush_times_out_while_matching_rows_are_unwritten(queues):
+    writer = FakeWriter(block=True)
+    queue = make_queue(queues, writer, batch_size=100, flush_interval=10)
+    queue.submit(('alice', 1))
+    queue.submit(('bob', 2))
+    assert not queue.flush(lambda row: row[0] == 'alice', timeout=0.1)
+    assert queue.flush(lambda row: row[0] == 'carol', timeout=0.1)
+    writer.release.set()
+    assert queue.flush(lambda row: row[0] == 'alice', timeout=2)
+    assert writer.batches == [[('alice', 1), ('bob', 2)]]
+
+
+def test_submit_gives_up_after_max_wait_when_the_queue_is_full(queues):
+    writer = FakeWriter(block=True)
+    queue = make_queue(queues, writer, batch_size=1, flush_interval=0, max_size=2, max_wait=0.1)
+    queue.submit(1)
+    assert writer.entered.wait(2)  # row 1 is in flight and its write is stuck
+    assert queue.submit(2) and queue.submit(3)
+    started = time.monotonic()
+    assert not queue.submit(4)
+    assert time.monotonic() - started >= 0.09
+    stats = queue.stats()
+    assert (stats['queued'], stats['rejected'], stats['backpressure_waits']) == (2, 1, 1)
+    writer.release.set()
+
+
+def test_close_writes_out_the_queue(queues):
+    writer = FakeWriter()
+    queue = make_queue(queues, writer, batch_size=100, flush_interval=10)
+    for row in range(5):
+        queue.submit(row)
+    assert queue.close(timeout=2)
+    assert writer.batches == [[0, 1, 2, 3, 4]]
+    assert not queue.submit(5)
+
+
+def test_close_cuts_the_retry_backoff_short(queues):
+    writer = FakeWriter(fail=lambda batch, attempt: attempt == 1)
+    queue = make_queue(queues, writer, batch_size=1, flush_interval=0, max_attempts=5)
+    queue.submit('row')
+    assert wait_for(lambda: queue.stats()['failures'] == 1)
+    started = time.monotonic()
+    assert queue.close(timeout=2)
+    # The first backoff is 0.5s; close() doesn't sit it out
+    assert time.monotonic() - started < 0.4
+    assert writer.batches == [['row'], ['row']]
+
+
+def test_batch_is_retried_then_written_row_by_row_with_bad_rows_dead_lettered(queues):
+    writer = FakeWriter(fail=lambda batch, attempt: 'bad' in batch)
+    dead = []
+    queue = make_queue(queues, writer, batch_size=3, flush_interval=10, max_attempts=2,
+                       dead_letter=lambda row, error: dead.append((row, str(error))))
+    for row in ('a', 'bad', 'c'):
+        queue.submit(row)
+    assert wait_for(lambda: queue.stats()['batches'] == 1)
+    assert writer.batches == [['a', 'bad', 'c'], ['a', 'bad', 'c'], ['a'], ['bad'], ['c']]
+    assert dead == [('bad', "cannot write ['bad']")]
+    stats = queue.stats()
+    assert (stats['written'], stats['failures'], stats['dead_lettered']) == (2, 1, 1)